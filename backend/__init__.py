@@ -0,0 +1,4 @@
+"""
+Atos Chatbot Backend
+Asyncio proxy between the generated chat component and the Copilot Studio API
+"""
@@ -0,0 +1,290 @@
+"""
+Answer caches for the chat backend
+"""
+
+import random
+import re
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+# Letters and digits of any script; an ASCII-only pattern reduced
+# "Как сбросить пароль VPN" to "vpn" and every CJK question to ''
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+# Scripts written without spaces between words (CJK, kana, Thai, Lao,
+# Khmer, Myanmar); each character counts as a word when sizing a query
+_UNSPACED_RE = re.compile(
+    '[\u0e00-\u0eff\u1000-\u109f\u1780-\u17ff\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]'
+)
+
+# Shorter queries ("vpn?", "help") name a topic, not a question; one
+# cached answer for them would be served to every user who types them
+MIN_CONTENT_WORDS = 2
+
+
+def normalize_query(text):
+    """Casefold, strip punctuation and collapse whitespace"""
+    return ' '.join(_WORD_RE.findall(unicodedata.normalize('NFKC', text).casefold()))
+
+
+class AnswerCache:
+    """Bounded LRU of the last good upstream body per normalized query"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    def put(self, key, body):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# Words that carry no intent in a search question; dropping them lets
+# "how do I reset my VPN password" and "reset vpn password how?" collide
+_STOPWORDS = frozenset("""
+a an and are can could do does for how i in is it me my of on or please should
+the to what when where which who why will with would you your
+""".split())
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _content_words(text):
+    return [word for word in normalize_query(text).split() if word not in _STOPWORDS]
+
+
+def is_cacheable(text):
+    """Whether a query has enough content words to share a cached answer"""
+    count = sum(len(_UNSPACED_RE.findall(word)) or 1 for word in _content_words(text))
+    return count >= MIN_CONTENT_WORDS
+
+
+def cache_key(text):
+    """Exact-match cache key, or '' for a query too short to cache"""
+    return normalize_query(text) if is_cacheable(text) else ''
+
+
+def query_features(text):
+    """Content words plus their character trigrams (tolerates typos and plurals)"""
+    words = _content_words(text)
+    features = set(words)
+    for word in words:
+        if len(word) > 3:
+            features.update(word[i:i + 3] for i in range(len(word) - 2))
+    return features
+
+
+def anchor_tokens(text):
+    """Short and numeric words, which must match exactly for a near hit
+
+    They contribute a single feature each against several trigrams for
+    longer words, so "python 3.11" and "python 3.12" would otherwise look
+    near-identical while asking different questions.
+    """
+    return frozenset(
+        word for word in _content_words(text)
+        if len(word) <= 3 or any(c.isdigit() for c in word)
+    )
+
+
+class MinHasher:
+    """Fixed family of universal hash functions producing MinHash signatures"""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._params = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, features):
+        hashes = [zlib.crc32(feature.encode('utf-8')) for feature in features]
+        if not hashes:
+            return None
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._params
+        )
+
+
+class NearDuplicateCache:
+    """Answer cache keyed by query similarity rather than exact text
+
+    Queries are indexed with MinHash signatures split into LSH bands; a
+    lookup only compares against entries sharing at least one band, and
+    serves the best one whose estimated Jaccard similarity reaches the
+    threshold and whose short and numeric words are the same. In shadow
+    mode matches, exact ones included, are counted but never served.
+    """
+
+    def __init__(self, threshold=0.8, max_entries=5000, ttl=3600.0,
+                 num_perm=64, bands=16, shadow=False, clock=time.monotonic):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shadow = shadow
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._hasher = MinHasher(num_perm)
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._exact = {}
+        self._buckets = [{} for _ in range(bands)]
+        self._next_id = 0
+        self.counters = {
+            'lookups': 0,
+            'too_short': 0,
+            'exact_hits': 0,
+            'near_hits': 0,
+            'shadow_exact_matches': 0,
+            'shadow_near_matches': 0,
+            'misses': 0,
+            'inserts': 0,
+            'evictions': 0,
+            'expired': 0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [signature[i * rows:(i + 1) * rows] for i in range(self.bands)]
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        if self._exact.get(entry['key']) == entry_id:
+            del self._exact[entry['key']]
+        for band, band_key in enumerate(self._band_keys(entry['signature'])):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def _live(self, entry_id):
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return None
+        if self.ttl and self._clock() - entry['stored_at'] > self.ttl:
+            self._remove(entry_id)
+            self.counters['expired'] += 1
+            return None
+        return entry
+
+    def _similarity(self, a, b):
+        return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+    def lookup(self, text):
+        """Return (body, similarity) for a servable match, else None"""
+        self.counters['lookups'] += 1
+        if not is_cacheable(text):
+            self.counters['too_short'] += 1
+            return None
+        key = normalize_query(text)
+
+        entry_id = self._exact.get(key)
+        if entry_id is not None and self._live(entry_id) is not None:
+            if self.shadow:
+                self.counters['shadow_exact_matches'] += 1
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(entry_id)
+            self.counters['exact_hits'] += 1
+            return self._entries[entry_id]['body'], 1.0
+
+        signature = self._hasher.signature(query_features(text))
+        if signature is None:
+            self.counters['misses'] += 1
+            return None
+
+        candidates = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(band_key, ()))
+
+        anchors = anchor_tokens(text)
+        best_id, best_similarity = None, 0.0
+        for candidate_id in candidates:
+            entry = self._live(candidate_id)
+            if entry is None or entry['anchors'] != anchors:
+                continue
+            similarity = self._similarity(signature, entry['signature'])
+            if similarity > best_similarity:
+                best_id, best_similarity = candidate_id, similarity
+
+        if best_id is None or best_similarity < self.threshold:
+            self.counters['misses'] += 1
+            return None
+        if self.shadow:
+            self.counters['shadow_near_matches'] += 1
+            self.counters['misses'] += 1
+            return None
+
+        self._entries.move_to_end(best_id)
+        self.counters['near_hits'] += 1
+        return self._entries[best_id]['body'], best_similarity
+
+    def fingerprint(self, text):
+        """(signature, anchors) of a cacheable query, else None
+
+        Caches built with the same num_perm share hash functions, so
+        another process can add the query without recomputing them.
+        """
+        if not is_cacheable(text):
+            return None
+        signature = self._hasher.signature(query_features(text))
+        if signature is None:
+            return None
+        return signature, anchor_tokens(text)
+
+    def add(self, text, body, fingerprint=None):
+        if self.max_entries <= 0:
+            return
+        if fingerprint is None:
+            fingerprint = self.fingerprint(text)
+            if fingerprint is None:
+                return
+        key = normalize_query(text)
+        signature, anchors = fingerprint
+
+        existing = self._exact.get(key)
+        if existing is not None and existing in self._entries:
+            self._remove(existing)
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = {
+            'key': key,
+            'signature': signature,
+            'anchors': anchors,
+            'body': body,
+            'stored_at': self._clock(),
+        }
+        self._exact[key] = entry_id
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(band_key, set()).add(entry_id)
+        self.counters['inserts'] += 1
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.counters['evictions'] += 1
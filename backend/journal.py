@@ -0,0 +1,451 @@
+"""
+Request journal: chat exchanges appended to compressed, indexed segments
+
+The request path only appends to an in-memory batch. A single writer
+thread serializes each batch into JSON lines, compresses them in blocks
+of about BLOCK_BYTES (one gzip member per block) and appends them to the
+current segment, so a segment is an ordinary multi-member .gz file that
+zcat and analytics tools read directly. Segments rotate by size and age;
+segments past the retention window are removed.
+
+Every record also gets a fixed-width entry in a sidecar .idx file:
+timestamp, block offset and length, offset and length inside the
+decompressed block, and a hash of the session id. When a segment
+closes, a .sidx sidecar lists its (session hash, entry number) pairs
+sorted by session. Readers memory-map these files, bisect the index by
+time or the .sidx by session, and decompress only the blocks they need;
+only the segment still being written is scanned entry by entry.
+
+    python -m backend.journal --session <id> --since 2024-05-01T09:00
+"""
+
+import argparse
+import asyncio
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger('atos_backend')
+
+# Raw bytes per compressed block: large enough to compress well, small
+# enough that reading one record decompresses little else
+BLOCK_BYTES = 64 * 1024
+
+# ts, block offset, block length, offset in block, record length, session hash
+_INDEX = struct.Struct('<dQIIIQ')
+_TS = struct.Struct('<d')
+
+# session hash, index entry number; sorted, written when a segment closes
+_SESSION_INDEX = struct.Struct('<QI')
+_KEY = struct.Struct('<Q')
+
+
+def session_hash(session):
+    """64-bit key stored in the index; 0 means no session"""
+    if not session:
+        return 0
+    digest = hashlib.blake2b(session.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+def _decode_json(body):
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode('utf-8', 'replace')
+
+
+def _encode_record(ts, request_body, status, source, response_body, duration):
+    request = _decode_json(request_body) if request_body else None
+    session = request.get('sessionId') if isinstance(request, dict) else None
+    if not isinstance(session, str):
+        session = None
+    record = {
+        'ts': round(ts, 6),
+        'session': session,
+        'status': status,
+        'source': source,
+        'duration_ms': round(duration * 1000, 1),
+        'request': request,
+        'response': _decode_json(response_body) if response_body else None,
+    }
+    line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+    return session, line.encode('utf-8')
+
+
+def _session_index_path(index_path):
+    return index_path[:-len('.idx')] + '.sidx'
+
+
+def segment_paths(directory):
+    """(data, index) paths of every segment, oldest first"""
+    segments = []
+    for index_path in sorted(glob.glob(os.path.join(directory, 'journal-*.idx'))):
+        stem = index_path[:-len('.idx')]
+        for data_path in (stem + '.jsonl.gz', stem + '.jsonl'):
+            if os.path.exists(data_path):
+                segments.append((data_path, index_path))
+                break
+    return segments
+
+
+class RequestJournal:
+    """Batched, non-blocking writer for chat exchanges"""
+
+    def __init__(self, directory, batch_size=256, flush_interval=1.0, max_pending=10000,
+                 segment_bytes=64 * 1024 * 1024, segment_seconds=3600.0,
+                 retention_seconds=7 * 24 * 3600.0, compress=True):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.retention_seconds = retention_seconds
+        self.compress = compress
+        self._pending = []
+        self._last_ts = 0.0
+        self._wakeup = None
+        self._task = None
+        self._executor = None
+        # Writer-thread state
+        self._data = None
+        self._index = None
+        self._segment_started = 0.0
+        self._segment_size = 0
+        self._session_index_path = None
+        self._session_entries = []
+        self._entry_count = 0
+        self._seq = 0
+        self.counters = {
+            'records': 0,
+            'dropped': 0,
+            'batches': 0,
+            'blocks': 0,
+            'raw_bytes': 0,
+            'bytes_written': 0,
+            'rotations': 0,
+            'write_errors': 0,
+        }
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._wakeup = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='journal')
+        self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def stop(self):
+        """Write out everything pending and close the current segment"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        loop = asyncio.get_running_loop()
+        await self._flush(loop)
+        await loop.run_in_executor(self._executor, self._close_segment)
+        self._executor.shutdown()
+
+    def record(self, request_body, response, duration):
+        """Queue one exchange; never blocks, drops when the writer falls behind"""
+        if len(self._pending) >= self.max_pending:
+            self.counters['dropped'] += 1
+            return
+        # Keep timestamps non-decreasing so each segment index stays sorted,
+        # and at the precision records store so their ts work as query bounds
+        ts = max(round(time.time(), 6), self._last_ts)
+        self._last_ts = ts
+        self._pending.append((
+            ts, request_body, response.status, response.headers.get('X-Atos-Source'),
+            response.body, duration,
+        ))
+        self.counters['records'] += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush(loop)
+
+    async def _flush(self, loop):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        await loop.run_in_executor(self._executor, self._write_batch, batch)
+
+    # -- writer thread -------------------------------------------------- #
+
+    def _write_batch(self, batch):
+        try:
+            if self._data is None or self._should_rotate(batch[0][0]):
+                self._rotate(batch[0][0])
+            lines = []
+            entries = []
+            raw_size = 0
+            for entry in batch:
+                session, line = _encode_record(*entry)
+                entries.append((entry[0], raw_size, len(line), session_hash(session)))
+                lines.append(line)
+                raw_size += len(line)
+                if raw_size >= BLOCK_BYTES:
+                    self._write_block(lines, entries)
+                    lines, entries, raw_size = [], [], 0
+            if lines:
+                self._write_block(lines, entries)
+            self._data.flush()
+            self._index.flush()
+            self.counters['batches'] += 1
+        except OSError as e:
+            self.counters['write_errors'] += 1
+            logger.warning("Journal write failed, %d records lost: %s", len(batch), e)
+            # The file may hold part of a block, so offsets tracked for this
+            # segment no longer match it; the next batch starts a new one
+            self._close_segment()
+
+    def _write_block(self, lines, entries):
+        raw = b''.join(lines)
+        block = gzip.compress(raw, compresslevel=6, mtime=0) if self.compress else raw
+        offset = self._segment_size
+        self._data.write(block)
+        # Index entries go out after their block, so readers never see an
+        # entry pointing past the end of the data file
+        self._data.flush()
+        self._index.write(b''.join(
+            _INDEX.pack(ts, offset, len(block), start, length, key)
+            for ts, start, length, key in entries
+        ))
+        for ts, start, length, key in entries:
+            if key:
+                self._session_entries.append((key, self._entry_count))
+            self._entry_count += 1
+        self._segment_size += len(block)
+        self.counters['blocks'] += 1
+        self.counters['raw_bytes'] += len(raw)
+        self.counters['bytes_written'] += len(block)
+
+    def _should_rotate(self, ts):
+        return (self._segment_size >= self.segment_bytes
+                or ts - self._segment_started >= self.segment_seconds)
+
+    def _rotate(self, ts):
+        if self._data is not None:
+            self.counters['rotations'] += 1
+        self._close_segment()
+        self._expire(ts)
+        self._seq += 1
+        stem = os.path.join(
+            self.directory, f"journal-{int(ts * 1000):013d}-{os.getpid()}-{self._seq:04d}"
+        )
+        self._data = open(stem + ('.jsonl.gz' if self.compress else '.jsonl'), 'ab')
+        self._index = open(stem + '.idx', 'ab')
+        self._session_index_path = _session_index_path(stem + '.idx')
+        self._segment_started = ts
+        self._segment_size = 0
+
+    def _close_segment(self):
+        closed = self._data is not None
+        for f in (self._data, self._index):
+            if f is not None:
+                try:
+                    f.close()
+                except OSError as e:
+                    logger.warning("Closing journal segment failed: %s", e)
+        self._data = self._index = None
+        if closed:
+            self._write_session_index()
+
+    def _write_session_index(self):
+        entries = sorted(self._session_entries)
+        self._session_entries, self._entry_count = [], 0
+        # Renamed into place, so a reader sees either no .sidx (and scans
+        # the index) or a complete one
+        path = self._session_index_path
+        try:
+            with open(path + '.tmp', 'wb') as f:
+                f.write(b''.join(_SESSION_INDEX.pack(key, entry) for key, entry in entries))
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logger.warning("Writing %s failed, session lookups will scan the index: %s", path, e)
+
+    def _expire(self, now):
+        # Active segments rotate long before they could age out, so this
+        # never removes a file a sibling worker is still writing
+        cutoff = now - self.retention_seconds
+        for data_path, index_path in segment_paths(self.directory):
+            try:
+                if os.path.getmtime(data_path) < cutoff:
+                    os.remove(data_path)
+                    os.remove(index_path)
+                    os.remove(_session_index_path(index_path))
+            except OSError:
+                pass
+
+
+def _bisect(view, count, entry, field, value):
+    """First of count fixed-width entries whose leading field is >= value"""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if field.unpack_from(view, mid * entry.size)[0] < value:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class JournalReader:
+    """Session and time-range lookups through the memory-mapped indexes"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def records(self, start=None, end=None, session=None):
+        """Records with start <= ts < end, optionally for one session, in time order per segment"""
+        key = session_hash(session) if session is not None else None
+        for data_path, index_path in segment_paths(self.directory):
+            yield from self._read_segment(data_path, index_path, start, end, session, key)
+
+    def _read_segment(self, data_path, index_path, start, end, session, key):
+        matches = self._lookup(index_path, start, end, key)
+        if not matches:
+            return
+        compressed = data_path.endswith('.gz')
+        with open(data_path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                logger.warning("Skipping %s: indexed records but no data", data_path)
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield from self._read_records(data, data_path, compressed, matches, session)
+
+    def _read_records(self, data, data_path, compressed, matches, session):
+        # A damaged block (e.g. a write cut short by a full disk) is skipped
+        # so the rest of the segment and the other segments stay readable
+        cached_offset, bad_offset, block = None, None, b''
+        for block_offset, block_length, record_offset, record_length in matches:
+            if block_offset == bad_offset:
+                continue
+            if block_offset != cached_offset:
+                block = data[block_offset:block_offset + block_length]
+                try:
+                    if len(block) != block_length:
+                        raise EOFError("block extends past the end of the file")
+                    if compressed:
+                        block = gzip.decompress(block)
+                except (OSError, EOFError, zlib.error) as e:
+                    logger.warning("Skipping unreadable block at offset %d in %s: %s",
+                                   block_offset, data_path, e)
+                    bad_offset = block_offset
+                    continue
+                cached_offset = block_offset
+            try:
+                record = json.loads(block[record_offset:record_offset + record_length])
+            except ValueError as e:
+                logger.warning("Skipping unreadable record in block at offset %d in %s: %s",
+                               block_offset, data_path, e)
+                continue
+            # The index holds hashes; confirm the actual session id
+            if session is None or record.get('session') == session:
+                yield record
+
+    def _lookup(self, index_path, start, end, key):
+        with open(index_path, 'rb') as f:
+            # A partially written trailing entry is ignored
+            count = os.fstat(f.fileno()).st_size // _INDEX.size
+            if not count:
+                return []
+            with mmap.mmap(f.fileno(), count * _INDEX.size, access=mmap.ACCESS_READ) as index:
+                if end is not None and _TS.unpack_from(index, 0)[0] >= end:
+                    return []
+                if start is not None and _TS.unpack_from(index, (count - 1) * _INDEX.size)[0] < start:
+                    return []
+                if key is not None:
+                    entries = self._session_entries(index_path, key, count)
+                    if entries is not None:
+                        return [
+                            (block_offset, block_length, record_offset, record_length)
+                            for ts, block_offset, block_length, record_offset, record_length, _key
+                            in (_INDEX.unpack_from(index, entry * _INDEX.size) for entry in entries)
+                            if (start is None or ts >= start) and (end is None or ts < end)
+                        ]
+                lo = _bisect(index, count, _INDEX, _TS, start) if start is not None else 0
+                hi = _bisect(index, count, _INDEX, _TS, end) if end is not None else count
+                return [
+                    (block_offset, block_length, record_offset, record_length)
+                    for _ts, block_offset, block_length, record_offset, record_length, entry_key
+                    in _INDEX.iter_unpack(index[lo * _INDEX.size:hi * _INDEX.size])
+                    if key is None or entry_key == key
+                ]
+
+
+    def _session_entries(self, index_path, key, count):
+        """Index entry numbers of one session from the .sidx, or None if the segment has none"""
+        try:
+            f = open(_session_index_path(index_path), 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            size = os.fstat(f.fileno()).st_size // _SESSION_INDEX.size
+            if not size:
+                return []
+            with mmap.mmap(f.fileno(), size * _SESSION_INDEX.size, access=mmap.ACCESS_READ) as sidx:
+                entries = []
+                for i in range(_bisect(sidx, size, _SESSION_INDEX, _KEY, key), size):
+                    entry_key, entry = _SESSION_INDEX.unpack_from(sidx, i * _SESSION_INDEX.size)
+                    if entry_key != key:
+                        break
+                    if entry < count:
+                        entries.append(entry)
+                return entries
+
+def _parse_time(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m backend.journal',
+        description="Print journaled chat exchanges as JSON lines (e.g. to feed a replay load test)",
+    )
+    parser.add_argument('--dir', default=os.environ.get('JOURNAL_DIR', 'journal'),
+                        help="journal directory (default: $JOURNAL_DIR or ./journal)")
+    parser.add_argument('--session', help="only this sessionId")
+    parser.add_argument('--since', type=_parse_time, help="epoch seconds or ISO 8601 time, inclusive")
+    parser.add_argument('--until', type=_parse_time, help="epoch seconds or ISO 8601 time, exclusive")
+    args = parser.parse_args(argv)
+
+    reader = JournalReader(args.dir)
+    out = sys.stdout
+    try:
+        for record in reader.records(args.since, args.until, args.session):
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
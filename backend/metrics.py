@@ -0,0 +1,184 @@
+"""
+Prometheus metrics for the chat backend
+
+Each process records into its own registry from its single event-loop
+thread, so recording is a dict update or a bisect plus a list increment
+with no locks. Counters the backend already keeps (cache, hedging,
+breaker) are read by collectors at scrape time instead of being
+duplicated on the request path.
+
+Snapshots are plain JSON-serializable dicts so pre-fork workers can ship
+them to the master, which sums them into one cluster-wide view.
+"""
+
+import bisect
+
+# Request latency as seen by the browser, and upstream latency per attempt
+HTTP_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0)
+
+METRIC_HELP = {
+    'atos_http_requests_total': "HTTP requests handled, by route and status",
+    'atos_http_request_duration_seconds': "Time from request parsed to response written",
+    'atos_inflight_requests': "Requests currently being handled (queue depth)",
+    'atos_chat_requests_total': "Chat requests received",
+    'atos_upstream_responses_total': "Upstream attempts by HTTP status (error = no response, cancelled = hedge loser)",
+    'atos_upstream_request_duration_seconds': "Duration of completed upstream attempts",
+    'atos_upstream_outcomes_total': "Chat requests by final upstream outcome",
+    'atos_fallback_responses_total': "Fallback answers served, by kind",
+    'atos_cache_lookups_total': "Answer cache lookups, by result",
+    'atos_cache_evictions_total': "Answer cache entries evicted for size",
+    'atos_cache_entries': "Answer cache entries",
+    'atos_coalesced_requests_total': "Chat requests by coalescing role (follower = shared a leader's upstream call)",
+    'atos_hedge_events_total': "Hedged request events",
+    'atos_breaker_events_total': "Circuit breaker events",
+    'atos_breaker_open': "Processes whose circuit breaker is open",
+    'atos_typeahead_entries': "Queries in the typeahead index",
+    'atos_response_bytes_total': "Response body bytes: upstream vs projected answers, and before vs after compression",
+    'atos_compressed_responses_total': "Responses sent with a Content-Encoding",
+    'atos_journal_events_total': "Request journal records, blocks, bytes and errors",
+    'atos_journal_pending': "Journal records waiting for the writer thread",
+}
+
+
+# State every pre-fork worker holds a copy of, and events every worker
+# sees for it (each answer is inserted into every worker's cache); merged
+# with max, since summing would multiply them by the number of workers
+REPLICATED_METRICS = frozenset({
+    'atos_cache_entries', 'atos_typeahead_entries', 'atos_cache_evictions_total',
+})
+
+
+def format_labels(**labels):
+    """Prometheus label string, e.g. route="/api/chat",status="200" """
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts are per bucket, cumulated on render"""
+
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._bounds = {}
+        self._collectors = []
+
+    def inc(self, name, labels='', amount=1):
+        series = self._counters.get(name)
+        if series is None:
+            series = self._counters[name] = {}
+        series[labels] = series.get(labels, 0) + amount
+
+    def register_histogram(self, name, bounds):
+        self._bounds[name] = tuple(bounds)
+        self._histograms[name] = {}
+
+    def observe(self, name, value, labels=''):
+        series = self._histograms[name]
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram(self._bounds[name])
+        histogram.observe(value)
+
+    def add_collector(self, collector):
+        """collector() returns {'counter': {...}, 'gauge': {...}} read at scrape time"""
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        snapshot = {
+            'counter': {name: dict(series) for name, series in self._counters.items()},
+            'gauge': {},
+            'histogram': {
+                name: {
+                    labels: {'bounds': list(h.bounds), 'counts': list(h.counts), 'sum': h.sum}
+                    for labels, h in series.items()
+                }
+                for name, series in self._histograms.items()
+            },
+        }
+        for collector in self._collectors:
+            collected = collector()
+            for kind in ('counter', 'gauge'):
+                for name, series in collected.get(kind, {}).items():
+                    snapshot[kind].setdefault(name, {}).update(series)
+        return snapshot
+
+
+def merge_snapshots(snapshots):
+    """Sum metric snapshots from several processes"""
+    merged = {'counter': {}, 'gauge': {}, 'histogram': {}}
+    for snapshot in snapshots:
+        if not snapshot:
+            continue
+        for kind in ('counter', 'gauge'):
+            for name, series in snapshot.get(kind, {}).items():
+                target = merged[kind].setdefault(name, {})
+                for labels, value in series.items():
+                    if name in REPLICATED_METRICS:
+                        target[labels] = max(target.get(labels, 0), value)
+                    else:
+                        target[labels] = target.get(labels, 0) + value
+        for name, series in snapshot.get('histogram', {}).items():
+            target = merged['histogram'].setdefault(name, {})
+            for labels, data in series.items():
+                existing = target.get(labels)
+                if existing is None:
+                    target[labels] = {
+                        'bounds': list(data['bounds']),
+                        'counts': list(data['counts']),
+                        'sum': data['sum'],
+                    }
+                else:
+                    existing['counts'] = [a + b for a, b in zip(existing['counts'], data['counts'])]
+                    existing['sum'] += data['sum']
+    return merged
+
+
+def _series_name(name, labels, extra=''):
+    inner = ','.join(part for part in (labels, extra) if part)
+    return f"{name}{{{inner}}}" if inner else name
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshot):
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for kind in ('counter', 'gauge'):
+        for name in sorted(snapshot.get(kind, {})):
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(snapshot[kind][name].items()):
+                lines.append(f"{_series_name(name, labels)} {_format_value(value)}")
+
+    for name in sorted(snapshot.get('histogram', {})):
+        lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, data in sorted(snapshot['histogram'][name].items()):
+            cumulative = 0
+            for bound, count in zip(data['bounds'] + ['+Inf'], data['counts']):
+                cumulative += count
+                le = bound if bound == '+Inf' else repr(float(bound))
+                series = _series_name(name + '_bucket', labels, 'le="%s"' % le)
+                lines.append(f"{series} {cumulative}")
+            lines.append(f"{_series_name(name + '_sum', labels)} {_format_value(float(data['sum']))}")
+            lines.append(f"{_series_name(name + '_count', labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,76 @@
+"""
+Response payload trimming and compression
+
+Upstream answers carry activity metadata, citation markup and other
+fields the chat component never reads; project_answer keeps only the
+text it displays. Larger text bodies are then compressed with the best
+coding the browser accepts. Brotli is used when the optional `brotli`
+package is installed, gzip otherwise.
+"""
+
+import gzip
+import json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Fields the chat component reads, in its order: data.message || data.response || data.content
+ANSWER_FIELDS = ('message', 'response', 'content')
+
+# Preferred first when the client weights codings equally
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# Fast settings: answers are small and compressed on the event loop
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def project_answer(body):
+    """Reduce an upstream JSON answer to {"message": text}; anything else is returned unchanged"""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(data, dict):
+        return body
+    text = next((data[field] for field in ANSWER_FIELDS if data.get(field)), None)
+    if not isinstance(text, str):
+        return body
+    return json.dumps({'message': text}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def is_compressible(content_type):
+    return bool(content_type) and (content_type.startswith('text/') or 'json' in content_type)
+
+
+def choose_encoding(accept_encoding):
+    """Best supported content coding for an Accept-Encoding header, or None for identity"""
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip().replace(' ', '')
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+
+    best, best_weight = None, 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body, coding):
+    if coding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
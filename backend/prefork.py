@@ -0,0 +1,530 @@
+"""
+Pre-fork serving mode for the chat backend
+
+The master process forks N workers. Each worker binds its own listening
+socket with SO_REUSEPORT, so the kernel spreads incoming connections
+across them without a shared accept lock. The master never serves HTTP.
+It restarts workers that die, performs a rolling restart on SIGHUP and
+relays state between workers over one socketpair per worker:
+
+  worker -> master   {"type": "query" | "answer", ...}   relayed to siblings
+  worker -> master   {"type": "stats", ...}              stats and metrics, latest kept per worker
+  worker -> master   {"type": "ready"}                   listening; siblings may retire
+  master -> worker   {"type": "cluster_stats", ...}      aggregated every second
+
+Messages are newline-delimited JSON with "type" as the first key, so
+the master reads the type from the start of a line and forwards query
+and answer lines without decoding them. Answers carry the answer cache
+fingerprint computed by the worker that asked upstream. Cache and
+typeahead updates reach the other workers within one flush interval
+(50 ms by default). A worker whose master has gone away stops.
+
+Signals (to the master):
+  SIGTERM / SIGINT   stop accepting, drain in-flight requests, exit
+  SIGHUP             rolling restart: start a new worker, retire an old one once
+                     the new one is listening, repeat
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import selectors
+import signal
+import socket
+import time
+
+from .metrics import merge_snapshots
+
+logger = logging.getLogger('atos_backend')
+
+FLUSH_INTERVAL = 0.05
+STATS_INTERVAL = 1.0
+RESPAWN_BACKOFF = 1.0
+
+
+def create_reuseport_socket(host, port, backlog=1024):
+    """Listening socket that sibling processes can bind to the same port"""
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        raise RuntimeError("SO_REUSEPORT is not supported on this platform")
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+_TYPE_PREFIX = b'{"type":"'
+
+
+def _encode(message):
+    message = {'type': message['type'], **message}
+    return json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def message_type(line):
+    """Type of an encoded message, read without decoding the rest of the line"""
+    if not line.startswith(_TYPE_PREFIX):
+        return None
+    end = line.find(b'"', len(_TYPE_PREFIX))
+    if end < 0:
+        return None
+    return line[len(_TYPE_PREFIX):end].decode('ascii', 'replace')
+
+
+# Per-process sizes rather than event counts. Caches are replicated to
+# every worker, so a sum would report N times the real entry count.
+SIZE_FIELDS = frozenset({'entries', 'samples', 'fallback_cache_entries', 'typeahead_entries'})
+
+# Answer cache events every worker sees for the same answers; reported
+# as the largest per-worker count rather than a sum
+REPLICATED_EVENTS = frozenset({'inserts', 'evictions', 'expired'})
+
+
+def _is_count(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def sum_counters(snapshots):
+    """Sum integer counters across worker stats snapshots, keeping the nesting"""
+    totals = {}
+    for snapshot in snapshots:
+        for name, value in snapshot.items():
+            if isinstance(value, dict):
+                totals[name] = sum_counters([totals.get(name, {}), value])
+            elif _is_count(value) and name in REPLICATED_EVENTS:
+                totals[name] = max(totals.get(name, 0), value)
+            elif _is_count(value) and name not in SIZE_FIELDS:
+                totals[name] = totals.get(name, 0) + value
+    return totals
+
+
+def size_fields(snapshot, prefix=''):
+    """Flatten one worker's SIZE_FIELDS, e.g. {'answer_cache.entries': 120}"""
+    sizes = {}
+    for name, value in snapshot.items():
+        if isinstance(value, dict):
+            sizes.update(size_fields(value, f"{prefix}{name}."))
+        elif _is_count(value) and name in SIZE_FIELDS:
+            sizes[prefix + name] = value
+    return sizes
+
+
+# ---------------------------------------------------------------------- #
+# Worker side
+# ---------------------------------------------------------------------- #
+
+class ClusterChannel:
+    """Worker end of the master socketpair"""
+
+    def __init__(self, sock, backend, on_lost=None):
+        self._sock = sock
+        self._backend = backend
+        self._on_lost = on_lost
+        self._outbox = []
+        self._reader = None
+        self._writer = None
+        self._tasks = []
+        self._cluster_stats = {}
+        self._cluster_metrics = None
+
+    async def start(self):
+        self._reader, self._writer = await asyncio.open_connection(sock=self._sock)
+        self._tasks = [
+            asyncio.ensure_future(self._read_loop()),
+            asyncio.ensure_future(self._flush_loop()),
+            asyncio.ensure_future(self._stats_loop()),
+        ]
+
+    async def stop(self):
+        self._flush()
+        for task in self._tasks:
+            task.cancel()
+        if self._writer is not None:
+            try:
+                await self._writer.drain()
+            except ConnectionError:
+                pass
+            self._writer.close()
+
+    def publish(self, message):
+        self._outbox.append(message)
+
+    def publish_answer(self, message, body, fingerprint=None):
+        if fingerprint is not None:
+            signature, anchors = fingerprint
+            fingerprint = [list(signature), sorted(anchors)]
+        self.publish({
+            'type': 'answer',
+            'message': message,
+            'body': base64.b64encode(body).decode('ascii'),
+            'fingerprint': fingerprint,
+        })
+
+    def snapshot(self):
+        return self._cluster_stats
+
+    def metrics_snapshot(self):
+        return self._cluster_metrics
+
+    def _flush(self):
+        if not self._outbox or self._writer is None or self._writer.is_closing():
+            return
+        self._writer.write(b''.join(_encode(message) for message in self._outbox))
+        self._outbox = []
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            self._flush()
+            try:
+                await self._writer.drain()
+            except ConnectionError:
+                return
+
+    async def _stats_loop(self):
+        while True:
+            self.publish({
+                'type': 'stats',
+                'stats': self._backend.local_stats(),
+                'metrics': self._backend.metrics.snapshot(),
+            })
+            await asyncio.sleep(STATS_INTERVAL)
+
+    async def _read_loop(self):
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                # Without a master nothing restarts or stops this worker
+                logger.warning("Lost connection to the pre-fork master, stopping")
+                if self._on_lost is not None:
+                    self._on_lost()
+                return
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self._apply(message)
+
+    def _apply(self, message):
+        kind = message.get('type')
+        if kind == 'query':
+            self._backend.record_query(message['message'], message.get('session', ''))
+        elif kind == 'answer':
+            fingerprint = message.get('fingerprint')
+            if fingerprint is not None:
+                signature, anchors = fingerprint
+                fingerprint = tuple(signature), frozenset(anchors)
+            self._backend.remember_answer(
+                message['message'], base64.b64decode(message['body']), fingerprint
+            )
+        elif kind == 'cluster_stats':
+            self._cluster_stats = message['stats']
+            self._cluster_metrics = message.get('metrics')
+
+
+async def _serve_worker(settings, channel_sock):
+    from .server import ChatBackend
+
+    backend = ChatBackend(settings)
+    await backend.start()
+    stop = asyncio.Event()
+    channel = ClusterChannel(channel_sock, backend, on_lost=stop.set)
+    await channel.start()
+    backend.cluster = channel
+
+    listener = create_reuseport_socket(settings.host, settings.port)
+    server = await asyncio.start_server(backend.handle_connection, sock=listener)
+    logger.info("Worker %d listening on %s:%d", os.getpid(), settings.host, settings.port)
+    channel.publish({'type': 'ready'})
+
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    await stop.wait()
+
+    # Stop accepting first; the kernel routes new connections to siblings
+    server.close()
+    deadline = loop.time() + settings.graceful_timeout
+    while backend.inflight and loop.time() < deadline:
+        await asyncio.sleep(0.05)
+    if backend.inflight:
+        logger.warning("Worker %d exiting with %d requests in flight", os.getpid(), backend.inflight)
+    await backend.stop()
+    await channel.stop()
+
+
+def _worker_main(settings, channel_sock):
+    # The master owns SIGINT/SIGHUP; workers only react to SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    asyncio.run(_serve_worker(settings, channel_sock))
+
+
+# ---------------------------------------------------------------------- #
+# Master side
+# ---------------------------------------------------------------------- #
+
+class _Worker:
+    def __init__(self, pid, sock):
+        self.pid = pid
+        self.sock = sock
+        self.started_at = time.monotonic()
+        self.inbuf = b''
+        self.outbuf = bytearray()
+        self.stats = {}
+        self.metrics = None
+        self.ready = False
+        self.retiring = False
+
+
+class PreforkMaster:
+    """Spawns, supervises and relays state between worker processes"""
+
+    def __init__(self, settings, num_workers):
+        self.settings = settings
+        self.num_workers = num_workers
+        self.workers = {}
+        self._selector = selectors.DefaultSelector()
+        self._stopping = False
+        self._reload_requested = False
+        self._pending_restarts = []
+        self._replacement = None
+        # Final metrics of exited workers, so cluster counters never go backwards
+        self._retired_metrics = None
+        self._last_stats_broadcast = 0.0
+        self._last_spawn_failure = 0.0
+
+    # -- process management -------------------------------------------- #
+
+    def spawn(self):
+        parent_sock, child_sock = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            parent_sock.close()
+            self._selector.close()
+            for worker in self.workers.values():
+                worker.sock.close()
+            exit_code = 0
+            try:
+                _worker_main(self.settings, child_sock)
+            except Exception:
+                logger.exception("Worker %d crashed", os.getpid())
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+
+        child_sock.close()
+        parent_sock.setblocking(False)
+        worker = _Worker(pid, parent_sock)
+        self.workers[pid] = worker
+        self._selector.register(parent_sock, selectors.EVENT_READ, worker)
+        logger.info("Started worker %d", pid)
+        return worker
+
+    def _forget(self, worker):
+        if worker.metrics:
+            self._retired_metrics = merge_snapshots([self._retired_metrics, worker.metrics])
+        self._selector.unregister(worker.sock)
+        worker.sock.close()
+        del self.workers[worker.pid]
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.get(pid)
+            if worker is None:
+                continue
+            self._forget(worker)
+            if worker.retiring or self._stopping:
+                logger.info("Worker %d exited", pid)
+                continue
+            logger.warning("Worker %d died (status %d)", pid, status)
+            if time.monotonic() - worker.started_at < RESPAWN_BACKOFF:
+                self._last_spawn_failure = time.monotonic()
+
+    def _maintain_pool(self):
+        if self._stopping:
+            return
+        active = [w for w in self.workers.values() if not w.retiring]
+        if len(active) >= self.num_workers:
+            return
+        # Avoid a fork loop when workers die right after starting (e.g. port in use)
+        if time.monotonic() - self._last_spawn_failure < RESPAWN_BACKOFF:
+            return
+        for _ in range(self.num_workers - len(active)):
+            self.spawn()
+
+    def _rolling_restart_step(self):
+        """Replace one old worker at a time, never dropping below the pool size"""
+        if self._reload_requested:
+            self._reload_requested = False
+            self._pending_restarts = [w.pid for w in self.workers.values() if not w.retiring]
+            logger.info("Rolling restart of %d workers", len(self._pending_restarts))
+        if self._stopping:
+            return
+
+        if self._replacement is not None:
+            new, old_pid = self._replacement
+            if new.pid not in self.workers:
+                # Replacement died before listening; keep the old worker
+                self._replacement = None
+                self._pending_restarts.insert(0, old_pid)
+                return
+            if not new.ready:
+                return
+            self._replacement = None
+            old = self.workers.get(old_pid)
+            if old is not None:
+                old.retiring = True
+                os.kill(old_pid, signal.SIGTERM)
+            return
+
+        if any(w.retiring for w in self.workers.values()):
+            return
+        while self._pending_restarts:
+            pid = self._pending_restarts.pop(0)
+            if pid in self.workers:
+                self._replacement = (self.spawn(), pid)
+                return
+
+    # -- state relay ----------------------------------------------------- #
+
+    def _send(self, worker, data):
+        worker.outbuf += data
+        self._selector.modify(worker.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, worker)
+
+    def _handle_readable(self, worker):
+        try:
+            data = worker.sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            return
+        worker.inbuf += data
+        *lines, worker.inbuf = worker.inbuf.split(b'\n')
+        relay = []
+        for line in lines:
+            kind = message_type(line)
+            if kind in ('query', 'answer'):
+                relay.append(line + b'\n')
+            elif kind == 'ready':
+                worker.ready = True
+            elif kind == 'stats':
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                worker.stats = message['stats']
+                worker.metrics = message.get('metrics')
+        if relay:
+            payload = b''.join(relay)
+            for sibling in self.workers.values():
+                if sibling is not worker:
+                    self._send(sibling, payload)
+
+    def _handle_writable(self, worker):
+        try:
+            sent = worker.sock.send(worker.outbuf)
+        except BlockingIOError:
+            return
+        except OSError:
+            worker.outbuf.clear()
+            sent = 0
+        del worker.outbuf[:sent]
+        if not worker.outbuf:
+            self._selector.modify(worker.sock, selectors.EVENT_READ, worker)
+
+    def _broadcast_stats(self):
+        now = time.monotonic()
+        if now - self._last_stats_broadcast < STATS_INTERVAL:
+            return
+        self._last_stats_broadcast = now
+        snapshots = [w.stats for w in self.workers.values() if w.stats]
+        metrics = merge_snapshots([self._retired_metrics] + [w.metrics for w in self.workers.values()])
+        # Gauges describe live processes only
+        metrics['gauge'] = merge_snapshots([w.metrics for w in self.workers.values()])['gauge']
+        message = _encode({
+            'type': 'cluster_stats',
+            'stats': {
+                'workers': len(self.workers),
+                'reporting': len(snapshots),
+                'totals': sum_counters(snapshots),
+                'sizes_per_worker': {
+                    str(w.pid): size_fields(w.stats) for w in self.workers.values() if w.stats
+                },
+            },
+            'metrics': metrics,
+        })
+        for worker in self.workers.values():
+            self._send(worker, message)
+
+    # -- main loop ------------------------------------------------------- #
+
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+
+    def _on_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+
+        logger.info("Pre-fork master %d starting %d workers on %s:%d",
+                    os.getpid(), self.num_workers, self.settings.host, self.settings.port)
+        self._maintain_pool()
+
+        while not self._stopping:
+            for key, events in self._selector.select(timeout=0.2):
+                worker = key.data
+                if worker.pid not in self.workers:
+                    continue
+                if events & selectors.EVENT_READ:
+                    self._handle_readable(worker)
+                if events & selectors.EVENT_WRITE and worker.pid in self.workers:
+                    self._handle_writable(worker)
+            self._reap()
+            self._rolling_restart_step()
+            self._maintain_pool()
+            self._broadcast_stats()
+
+        self.shutdown()
+
+    def shutdown(self):
+        logger.info("Stopping %d workers", len(self.workers))
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.settings.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for pid in list(self.workers):
+            logger.warning("Killing worker %d", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self._selector.close()
+
+
+def run_prefork(settings):
+    num_workers = settings.workers if settings.workers > 0 else (os.cpu_count() or 1)
+    if not settings.upstream_url:
+        logger.warning("COPILOT_UPSTREAM_URL is not set - every request will use the fallback answer")
+    PreforkMaster(settings, num_workers).run()
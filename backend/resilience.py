@@ -0,0 +1,164 @@
+"""
+Tail-latency and failure handling for upstream calls
+
+- LatencyTracker: sliding window of recent upstream latencies
+- HedgedCaller: sends a second request once the first one is slower than a
+  configurable percentile, keeps whichever reply arrives first and cancels
+  the other
+- CircuitBreaker: opens after sustained failures so callers can fail fast
+"""
+
+import asyncio
+import time
+from collections import deque
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies (seconds)"""
+
+    def __init__(self, window=500):
+        self._samples = deque(maxlen=window)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds):
+        self._samples.append(seconds)
+
+    def percentile(self, p):
+        """Nearest-rank percentile of the current window, or None if empty"""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(0, min(len(ordered) - 1, int(round(p / 100.0 * len(ordered))) - 1))
+        return ordered[rank]
+
+
+class HedgedCaller:
+    """Run a coroutine factory with a hedged backup request
+
+    The factory must be safe to call twice (the chat request is a read as
+    far as the upstream is concerned).
+    """
+
+    def __init__(self, tracker, percentile=95.0, min_samples=20, default_delay=2.0, enabled=True):
+        self.tracker = tracker
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.enabled = enabled
+        self.counters = {
+            'calls': 0,
+            'hedges_sent': 0,
+            'primary_wins': 0,
+            'hedge_wins': 0,
+            'losers_cancelled': 0,
+        }
+
+    def hedge_delay(self):
+        """Seconds to wait before sending the hedge request"""
+        if len(self.tracker) < self.min_samples:
+            return self.default_delay
+        return self.tracker.percentile(self.percentile)
+
+    async def _timed_primary(self, factory):
+        # Only primaries feed the tracker, and a cancelled one records how
+        # long it had been running: those are exactly the slow tail the
+        # hedge delay is derived from, so dropping them would pull it down
+        started = time.monotonic()
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            self.tracker.record(time.monotonic() - started)
+            raise
+        self.tracker.record(time.monotonic() - started)
+        return result
+
+    async def call(self, factory):
+        self.counters['calls'] += 1
+        primary = asyncio.ensure_future(self._timed_primary(factory))
+        if not self.enabled:
+            return await primary
+
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay())
+            if done:
+                pending = set()
+                result = primary.result()
+                self.counters['primary_wins'] += 1
+                return result
+
+            hedge = asyncio.ensure_future(factory())
+            self.counters['hedges_sent'] += 1
+            pending = {primary, hedge}
+            last_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.counters['hedge_wins' if task is hedge else 'primary_wins'] += 1
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+                self.counters['losers_cancelled'] += 1
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.counters = {
+            'successes': 0,
+            'failures': 0,
+            'opened': 0,
+            'short_circuited': 0,
+            'half_open_probes': 0,
+        }
+
+    def allow_request(self):
+        """Return True if a request may go upstream right now"""
+        if self.state == self.OPEN:
+            if self._clock() - self._opened_at < self.reset_timeout:
+                self.counters['short_circuited'] += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self.counters['short_circuited'] += 1
+                return False
+            self._probe_in_flight = True
+            self.counters['half_open_probes'] += 1
+        return True
+
+    def record_success(self):
+        self.counters['successes'] += 1
+        self._consecutive_failures = 0
+        self._probe_in_flight = False
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self.counters['failures'] += 1
+        self._consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.counters['opened'] += 1
+            self.state = self.OPEN
+            self._opened_at = self._clock()
@@ -0,0 +1,633 @@
+"""
+Asyncio HTTP server for the chat backend
+
+Endpoints:
+  POST /api/chat                forward {message, sessionId} to Copilot Studio
+  GET  /api/suggest?q=<prefix>  typeahead suggestions from past queries
+  GET  /stats                   JSON counters for tuning hedging, the circuit breaker and caches
+  GET  /metrics                 Prometheus metrics
+  GET  /healthz                 liveness probe
+"""
+
+import asyncio
+import json
+import logging
+import signal
+import time
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from .cache import AnswerCache, NearDuplicateCache, cache_key
+from .journal import RequestJournal
+from .metrics import HTTP_BUCKETS, UPSTREAM_BUCKETS, MetricsRegistry, format_labels, render
+from .payload import choose_encoding, compress, is_compressible, project_answer
+from .resilience import CircuitBreaker, HedgedCaller, LatencyTracker
+from .settings import Settings
+from .typeahead import SuggestionIndex
+from .upstream import UpstreamError, post_json
+
+logger = logging.getLogger('atos_backend')
+
+MAX_BODY_BYTES = 1024 * 1024
+
+# Bounded label values for per-route metrics
+ROUTES = ('/api/chat', '/api/suggest', '/stats', '/metrics', '/healthz')
+_route_labels = {}
+
+
+def _http_labels(path, status):
+    route = path.split('?', 1)[0]
+    if route not in ROUTES:
+        route = 'other'
+    labels = _route_labels.get((route, status))
+    if labels is None:
+        labels = _route_labels[(route, status)] = (
+            format_labels(route=route), format_labels(route=route, status=status)
+        )
+    return labels
+
+_REASONS = {
+    200: 'OK',
+    204: 'No Content',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    502: 'Bad Gateway',
+    504: 'Gateway Timeout',
+}
+
+
+class HttpRequest:
+    def __init__(self, method, path, headers, body):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+
+class HttpResponse:
+    def __init__(self, status, body=b'', content_type='application/json', headers=None, upstream_size=None):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+        # Size of the upstream answer this body was projected from
+        self.upstream_size = upstream_size
+
+
+def json_response(status, payload, headers=None):
+    return HttpResponse(status, json.dumps(payload).encode('utf-8'), headers=headers)
+
+
+class ChatBackend:
+    """Request handling and shared state for one server process"""
+
+    def __init__(self, settings=None):
+        self.settings = settings or Settings()
+        self.latency = LatencyTracker(self.settings.latency_window)
+        self.hedger = HedgedCaller(
+            self.latency,
+            percentile=self.settings.hedge_percentile,
+            min_samples=self.settings.hedge_min_samples,
+            default_delay=self.settings.hedge_default_delay,
+            enabled=self.settings.hedge_enabled,
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=self.settings.breaker_failure_threshold,
+            reset_timeout=self.settings.breaker_reset_timeout,
+        )
+        self.fallback_cache = AnswerCache(self.settings.fallback_cache_size)
+        self.answer_cache = None
+        if self.settings.near_cache_enabled:
+            self.answer_cache = NearDuplicateCache(
+                threshold=self.settings.near_cache_threshold,
+                max_entries=self.settings.near_cache_max_entries,
+                ttl=self.settings.near_cache_ttl,
+                shadow=self.settings.near_cache_shadow,
+            )
+        self.suggestions = None
+        if self.settings.typeahead_enabled:
+            self.suggestions = SuggestionIndex(
+                max_entries=self.settings.typeahead_max_entries,
+                limit=self.settings.typeahead_limit,
+                min_count=self.settings.typeahead_min_count,
+            )
+            if self.settings.typeahead_seed_file:
+                try:
+                    loaded = self.suggestions.load_jsonl(self.settings.typeahead_seed_file)
+                    logger.info("Loaded %d queries into the typeahead index", loaded)
+                except OSError as e:
+                    logger.warning("Could not read typeahead seed file: %s", e)
+        self.journal = None
+        if self.settings.journal_enabled:
+            self.journal = RequestJournal(
+                self.settings.journal_dir,
+                batch_size=self.settings.journal_batch_size,
+                flush_interval=self.settings.journal_flush_interval,
+                max_pending=self.settings.journal_max_pending,
+                segment_bytes=int(self.settings.journal_segment_mb * 1024 * 1024),
+                segment_seconds=self.settings.journal_segment_seconds,
+                retention_seconds=self.settings.journal_retention_hours * 3600,
+                compress=self.settings.journal_compress,
+            )
+        # Set by the pre-fork worker to share state with sibling processes
+        self.cluster = None
+        self.inflight = 0
+        # Identical messages in flight share one upstream call (COALESCE_REQUESTS)
+        self._flights = {}
+        self.counters = {
+            'requests': 0,
+            'upstream_ok': 0,
+            'upstream_errors': 0,
+            'upstream_timeouts': 0,
+            'fallback_cached': 0,
+            'fallback_static': 0,
+            'coalesced_leaders': 0,
+            'coalesced_followers': 0,
+            'upstream_bytes': 0,
+            'projected_bytes': 0,
+            'compressed_responses': 0,
+            'bytes_before_compression': 0,
+            'bytes_after_compression': 0,
+        }
+
+        self.metrics = MetricsRegistry()
+        self.metrics.register_histogram('atos_http_request_duration_seconds', HTTP_BUCKETS)
+        self.metrics.register_histogram('atos_upstream_request_duration_seconds', UPSTREAM_BUCKETS)
+        self.metrics.add_collector(self._collect_metrics)
+
+    async def start(self):
+        if self.journal is not None:
+            await self.journal.start()
+
+    async def stop(self):
+        if self.journal is not None:
+            await self.journal.stop()
+
+    # ------------------------------------------------------------------ #
+    # Routing
+    # ------------------------------------------------------------------ #
+
+    async def dispatch(self, request):
+        path = request.path.split('?', 1)[0]
+        if request.method == 'OPTIONS':
+            return HttpResponse(204, content_type=None)
+        if path == '/api/chat':
+            if request.method != 'POST':
+                return json_response(405, {'error': 'Use POST'})
+            return await self.handle_chat(request)
+        if path == '/api/suggest' and request.method == 'GET':
+            return self.handle_suggest(request)
+        if path == '/stats' and request.method == 'GET':
+            return json_response(200, self.stats())
+        if path == '/metrics' and request.method == 'GET':
+            return self.handle_metrics()
+        if path == '/healthz' and request.method == 'GET':
+            return json_response(200, {'status': 'ok', 'breaker': self.breaker.state})
+        return json_response(404, {'error': 'Not found'})
+
+    # ------------------------------------------------------------------ #
+    # Chat
+    # ------------------------------------------------------------------ #
+
+    def _upstream_headers(self):
+        headers = {}
+        if self.settings.upstream_api_key:
+            headers['Authorization'] = f"Bearer {self.settings.upstream_api_key}"
+        if self.settings.upstream_subscription_key:
+            headers['Ocp-Apim-Subscription-Key'] = self.settings.upstream_subscription_key
+        return headers
+
+    def _fallback(self, message):
+        # Too-short messages ("help", "???") have no key and never share an answer
+        key = cache_key(message)
+        cached = self.fallback_cache.get(key) if key else None
+        if cached is not None:
+            self.counters['fallback_cached'] += 1
+            return HttpResponse(200, cached, headers={'X-Atos-Source': 'fallback-cache'})
+        self.counters['fallback_static'] += 1
+        return json_response(
+            200,
+            {'message': self.settings.fallback_message, 'fallback': True},
+            headers={'X-Atos-Source': 'fallback'},
+        )
+
+    async def handle_chat(self, request):
+        if self.journal is None:
+            return await self._handle_chat(request)
+        started = time.perf_counter()
+        response = await self._handle_chat(request)
+        self.journal.record(request.body, response, time.perf_counter() - started)
+        return response
+
+    async def _handle_chat(self, request):
+        self.counters['requests'] += 1
+        try:
+            payload = json.loads(request.body.decode('utf-8') or '{}')
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return json_response(400, {'error': 'Request body must be JSON'})
+        message = payload.get('message') if isinstance(payload, dict) else None
+        if not isinstance(message, str) or not message.strip():
+            return json_response(400, {'error': 'Missing "message"'})
+
+        session = payload.get('sessionId')
+        session = session if isinstance(session, str) else ''
+        self.record_query(message, session)
+        if self.cluster is not None:
+            self.cluster.publish({'type': 'query', 'message': message, 'session': session})
+
+        if self.answer_cache is not None:
+            cached = self.answer_cache.lookup(message)
+            if cached is not None:
+                body, similarity = cached
+                return HttpResponse(200, body, headers={
+                    'X-Atos-Source': 'cache',
+                    'X-Atos-Similarity': f"{similarity:.2f}",
+                })
+
+        if not self.settings.coalesce_requests:
+            return await self._ask_upstream(message, payload)
+
+        # Exact text only: a normalized key would hand one user's answer to
+        # a differently worded (or differently cased) question
+        key = message
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.counters['coalesced_followers'] += 1
+            return await asyncio.shield(flight)
+
+        self.counters['coalesced_leaders'] += 1
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            response = await self._ask_upstream(message, payload)
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # Mark retrieved so a flight without followers does not log a warning
+            flight.exception()
+            raise
+        else:
+            flight.set_result(response)
+            return response
+        finally:
+            del self._flights[key]
+
+    async def _call_upstream(self, payload, headers):
+        """One upstream attempt, recorded in the upstream metrics"""
+        started = time.perf_counter()
+        try:
+            response = await post_json(self.settings.upstream_url, payload, headers)
+        except UpstreamError as e:
+            self.metrics.observe('atos_upstream_request_duration_seconds', time.perf_counter() - started)
+            self.metrics.inc('atos_upstream_responses_total', format_labels(status=e.status or 'error'))
+            raise
+        except asyncio.CancelledError:
+            self.metrics.inc('atos_upstream_responses_total', format_labels(status='cancelled'))
+            raise
+        self.metrics.observe('atos_upstream_request_duration_seconds', time.perf_counter() - started)
+        self.metrics.inc('atos_upstream_responses_total', format_labels(status=response.status))
+        return response
+
+    async def _ask_upstream(self, message, payload):
+        if not self.breaker.allow_request():
+            return self._fallback(message)
+
+        headers = self._upstream_headers()
+        try:
+            upstream = await asyncio.wait_for(
+                self.hedger.call(lambda: self._call_upstream(payload, headers)),
+                timeout=self.settings.upstream_timeout,
+            )
+        except asyncio.TimeoutError:
+            self.counters['upstream_timeouts'] += 1
+            self.breaker.record_failure()
+            logger.warning("Upstream timed out after %.1fs", self.settings.upstream_timeout)
+            return self._fallback(message)
+        except UpstreamError as e:
+            self.counters['upstream_errors'] += 1
+            if e.status is not None and 400 <= e.status < 500:
+                # The upstream is healthy, it just rejected this request; keep
+                # the 4xx so clients do not retry what will fail again
+                self.breaker.record_success()
+                return json_response(e.status, {'error': str(e)})
+            self.breaker.record_failure()
+            logger.warning("Upstream error: %s", e)
+            return self._fallback(message)
+
+        self.counters['upstream_ok'] += 1
+        self.breaker.record_success()
+        # Caches and sibling workers keep the projected body too
+        body = project_answer(upstream.body) if self.settings.response_projection else upstream.body
+        self.counters['upstream_bytes'] += len(upstream.body)
+        self.counters['projected_bytes'] += len(body)
+        fingerprint = self.remember_answer(message, body)
+        if self.cluster is not None:
+            self.cluster.publish_answer(message, body, fingerprint)
+        return HttpResponse(
+            200, body, headers={'X-Atos-Source': 'upstream'}, upstream_size=len(upstream.body)
+        )
+
+    def record_query(self, message, session=''):
+        if self.suggestions is not None:
+            self.suggestions.add(message, session=session)
+
+    def remember_answer(self, message, body, fingerprint=None):
+        """Cache an answer; returns the answer cache fingerprint for sibling workers"""
+        key = cache_key(message)
+        if key:
+            self.fallback_cache.put(key, body)
+        if self.answer_cache is None:
+            return None
+        if fingerprint is None:
+            fingerprint = self.answer_cache.fingerprint(message)
+        self.answer_cache.add(message, body, fingerprint)
+        return fingerprint
+
+    def handle_suggest(self, request):
+        if self.suggestions is None:
+            return json_response(404, {'error': 'Typeahead is disabled'})
+        params = parse_qs(urlsplit(request.path).query)
+        prefix = params.get('q', [''])[0]
+        try:
+            limit = int(params.get('limit', ['0'])[0]) or None
+        except ValueError:
+            limit = None
+        return json_response(
+            200,
+            {'suggestions': self.suggestions.suggest(prefix, limit)},
+            headers={'Cache-Control': 'private, max-age=30'},
+        )
+
+    def handle_metrics(self):
+        snapshot = None
+        if self.cluster is not None:
+            snapshot = self.cluster.metrics_snapshot()
+        if not snapshot:
+            snapshot = self.metrics.snapshot()
+        return HttpResponse(
+            200,
+            render(snapshot).encode('utf-8'),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+    def _collect_metrics(self):
+        counters = self.counters
+        counter = {
+            'atos_chat_requests_total': {'': counters['requests']},
+            'atos_upstream_outcomes_total': {
+                format_labels(outcome='ok'): counters['upstream_ok'],
+                format_labels(outcome='error'): counters['upstream_errors'],
+                format_labels(outcome='timeout'): counters['upstream_timeouts'],
+            },
+            'atos_fallback_responses_total': {
+                format_labels(kind='cached'): counters['fallback_cached'],
+                format_labels(kind='static'): counters['fallback_static'],
+            },
+            'atos_coalesced_requests_total': {
+                format_labels(role='leader'): counters['coalesced_leaders'],
+                format_labels(role='follower'): counters['coalesced_followers'],
+            },
+            'atos_hedge_events_total': {
+                format_labels(event=event): value for event, value in self.hedger.counters.items()
+            },
+            'atos_breaker_events_total': {
+                format_labels(event=event): value for event, value in self.breaker.counters.items()
+            },
+            'atos_response_bytes_total': {
+                format_labels(stage='upstream'): counters['upstream_bytes'],
+                format_labels(stage='projected'): counters['projected_bytes'],
+                format_labels(stage='before_compression'): counters['bytes_before_compression'],
+                format_labels(stage='after_compression'): counters['bytes_after_compression'],
+            },
+            'atos_compressed_responses_total': {'': counters['compressed_responses']},
+        }
+        gauge = {
+            'atos_inflight_requests': {'': self.inflight},
+            'atos_breaker_open': {'': int(self.breaker.state == CircuitBreaker.OPEN)},
+        }
+        if self.answer_cache is not None:
+            cache = self.answer_cache.counters
+            counter['atos_cache_lookups_total'] = {
+                format_labels(result='exact_hit'): cache['exact_hits'],
+                format_labels(result='near_hit'): cache['near_hits'],
+                format_labels(result='shadow_exact_match'): cache['shadow_exact_matches'],
+                format_labels(result='shadow_match'): cache['shadow_near_matches'],
+                format_labels(result='too_short'): cache['too_short'],
+                format_labels(result='miss'): (
+                    cache['misses'] - cache['shadow_exact_matches'] - cache['shadow_near_matches']
+                ),
+            }
+            counter['atos_cache_evictions_total'] = {'': cache['evictions']}
+            gauge['atos_cache_entries'] = {'': len(self.answer_cache)}
+        if self.suggestions is not None:
+            gauge['atos_typeahead_entries'] = {'': len(self.suggestions)}
+        if self.journal is not None:
+            counter['atos_journal_events_total'] = {
+                format_labels(event=event): value for event, value in self.journal.counters.items()
+            }
+            gauge['atos_journal_pending'] = {'': len(self.journal)}
+        return {'counter': counter, 'gauge': gauge}
+
+    def stats(self):
+        stats = self.local_stats()
+        if self.cluster is not None:
+            stats['cluster'] = self.cluster.snapshot()
+        return stats
+
+    def local_stats(self):
+        return {
+            'backend': dict(self.counters),
+            'hedging': dict(self.hedger.counters, hedge_delay_seconds=self.hedger.hedge_delay()),
+            'breaker': dict(self.breaker.counters, state=self.breaker.state),
+            'latency_seconds': {
+                'samples': len(self.latency),
+                'p50': self.latency.percentile(50),
+                'p95': self.latency.percentile(95),
+                'p99': self.latency.percentile(99),
+            },
+            'fallback_cache_entries': len(self.fallback_cache),
+            'answer_cache': self._answer_cache_stats(),
+            'typeahead_entries': len(self.suggestions) if self.suggestions is not None else None,
+            'journal': self._journal_stats(),
+        }
+
+    def _journal_stats(self):
+        if self.journal is None:
+            return {'enabled': False}
+        return dict(self.journal.counters, enabled=True, pending=len(self.journal))
+
+    def _answer_cache_stats(self):
+        if self.answer_cache is None:
+            return {'enabled': False}
+        return dict(
+            self.answer_cache.counters,
+            enabled=True,
+            shadow=self.answer_cache.shadow,
+            threshold=self.answer_cache.threshold,
+            entries=len(self.answer_cache),
+        )
+
+    # ------------------------------------------------------------------ #
+    # HTTP/1.1 plumbing
+    # ------------------------------------------------------------------ #
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise ValueError(f"Malformed request line: {request_line!r}")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', '0') or 0)
+        if length > MAX_BODY_BYTES:
+            raise OverflowError(length)
+        body = await reader.readexactly(length) if length else b''
+        return HttpRequest(method.upper(), target, headers, body)
+
+    def _write_response(self, writer, response, keep_alive):
+        headers = {
+            'Content-Length': str(len(response.body)),
+            'Connection': 'keep-alive' if keep_alive else 'close',
+            'Access-Control-Allow-Origin': self.settings.allowed_origin,
+            'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type, Authorization, Ocp-Apim-Subscription-Key',
+        }
+        if response.content_type:
+            headers['Content-Type'] = response.content_type
+        headers.update(response.headers)
+        reason = _REASONS.get(response.status)
+        if reason is None:
+            try:
+                reason = HTTPStatus(response.status).phrase
+            except ValueError:
+                reason = 'Unknown'
+        head = f"HTTP/1.1 {response.status} {reason}\r\n" + ''.join(
+            f"{name}: {value}\r\n" for name, value in headers.items()
+        ) + "\r\n"
+        writer.write(head.encode('latin-1') + response.body)
+
+    def _encode_response(self, request, response):
+        """Compress larger text bodies the client accepts compressed, and log bytes saved"""
+        size = len(response.body)
+        body, headers = response.body, response.headers
+        if (self.settings.compression_enabled and size >= self.settings.compression_min_bytes
+                and is_compressible(response.content_type)):
+            headers = dict(headers, Vary='Accept-Encoding')
+            coding = choose_encoding(request.headers.get('accept-encoding', ''))
+            if coding is not None:
+                compressed = compress(body, coding)
+                if len(compressed) < size:
+                    body = compressed
+                    headers['Content-Encoding'] = coding
+                    self.counters['compressed_responses'] += 1
+                    self.counters['bytes_before_compression'] += size
+                    self.counters['bytes_after_compression'] += len(body)
+
+        if self.settings.log_response_savings and request.path.startswith('/api/chat'):
+            original = response.upstream_size or size
+            saved = 100.0 * (original - len(body)) / original if original else 0.0
+            source = response.headers.get('X-Atos-Source', '-')
+            encoding = headers.get('Content-Encoding', 'identity')
+            if response.upstream_size is not None:
+                logger.info("Chat response %s: %d bytes upstream, %d projected, %d sent (%s), %.0f%% saved",
+                            source, original, size, len(body), encoding, saved)
+            else:
+                logger.info("Chat response %s: %d bytes, %d sent (%s), %.0f%% saved",
+                            source, size, len(body), encoding, saved)
+
+        if headers is response.headers:
+            return response
+        # Coalesced requests share one response object, so never modify it
+        return HttpResponse(response.status, body, response.content_type, headers, response.upstream_size)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except OverflowError:
+                    self._write_response(writer, json_response(413, {'error': 'Body too large'}), False)
+                    break
+                except (ValueError, asyncio.IncompleteReadError):
+                    self._write_response(writer, json_response(400, {'error': 'Bad request'}), False)
+                    break
+                if request is None:
+                    break
+
+                keep_alive = request.headers.get('connection', '').lower() != 'close'
+                started = time.perf_counter()
+                self.inflight += 1
+                try:
+                    try:
+                        response = await self.dispatch(request)
+                    except Exception:
+                        logger.exception("Unhandled error for %s %s", request.method, request.path)
+                        response = json_response(500, {'error': 'Internal error'})
+                    response = self._encode_response(request, response)
+                    self._write_response(writer, response, keep_alive)
+                    await writer.drain()
+                finally:
+                    self.inflight -= 1
+
+                route_labels, status_labels = _http_labels(request.path, response.status)
+                self.metrics.observe(
+                    'atos_http_request_duration_seconds', time.perf_counter() - started, route_labels
+                )
+                self.metrics.inc('atos_http_requests_total', status_labels)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(settings=None):
+    backend = ChatBackend(settings)
+    server = await asyncio.start_server(
+        backend.handle_connection, backend.settings.host, backend.settings.port
+    )
+    logger.info("Chat backend listening on %s:%d", backend.settings.host, backend.settings.port)
+    if not backend.settings.upstream_url:
+        logger.warning("COPILOT_UPSTREAM_URL is not set - every request will use the fallback answer")
+    # SIGTERM stops accepting and lets the journal write out what it holds
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    await backend.start()
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        await backend.stop()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    settings = Settings()
+    if settings.workers != 1:
+        from .prefork import run_prefork
+        run_prefork(settings)
+        return
+    try:
+        asyncio.run(serve(settings))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
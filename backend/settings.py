@@ -0,0 +1,87 @@
+"""
+Backend settings, read from environment variables
+"""
+
+import os
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, '') else default
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+class Settings:
+    """Runtime configuration for the chat backend"""
+
+    def __init__(self):
+        self.host = os.environ.get('BACKEND_HOST', '0.0.0.0')
+        self.port = _env_int('BACKEND_PORT', 8080)
+        self.upstream_url = os.environ.get('COPILOT_UPSTREAM_URL', '')
+        self.upstream_api_key = os.environ.get('COPILOT_API_KEY', '')
+        self.upstream_subscription_key = os.environ.get('COPILOT_SUBSCRIPTION_KEY', '')
+        self.upstream_timeout = _env_float('UPSTREAM_TIMEOUT', 30.0)
+        self.allowed_origin = os.environ.get('BACKEND_ALLOWED_ORIGIN', '*')
+
+        # Pre-fork mode: 1 runs a single process, 0 runs one worker per CPU
+        self.workers = _env_int('BACKEND_WORKERS', 1)
+        self.graceful_timeout = _env_float('BACKEND_GRACEFUL_TIMEOUT', 30.0)
+
+        # Hedged requests: send a second request once the first one has been
+        # outstanding longer than this percentile of recent upstream latencies
+        self.hedge_enabled = _env_int('HEDGE_ENABLED', 1) == 1
+        self.hedge_percentile = _env_float('HEDGE_PERCENTILE', 95.0)
+        self.hedge_min_samples = _env_int('HEDGE_MIN_SAMPLES', 20)
+        self.hedge_default_delay = _env_float('HEDGE_DEFAULT_DELAY', 2.0)
+        self.latency_window = _env_int('LATENCY_WINDOW', 500)
+
+        # Circuit breaker
+        self.breaker_failure_threshold = _env_int('BREAKER_FAILURE_THRESHOLD', 5)
+        self.breaker_reset_timeout = _env_float('BREAKER_RESET_TIMEOUT', 30.0)
+
+        # Request coalescing: concurrent requests with the same message text
+        # share one upstream call and its answer, whoever sent them
+        self.coalesce_requests = _env_int('COALESCE_REQUESTS', 0) == 1
+
+        # Near-duplicate answer cache (MinHash/LSH over normalized queries)
+        self.near_cache_enabled = _env_int('NEAR_CACHE_ENABLED', 1) == 1
+        self.near_cache_shadow = _env_int('NEAR_CACHE_SHADOW', 0) == 1
+        self.near_cache_threshold = _env_float('NEAR_CACHE_THRESHOLD', 0.8)
+        self.near_cache_max_entries = _env_int('NEAR_CACHE_MAX_ENTRIES', 5000)
+        self.near_cache_ttl = _env_float('NEAR_CACHE_TTL', 3600.0)
+
+        # Typeahead suggestions
+        self.typeahead_enabled = _env_int('TYPEAHEAD_ENABLED', 1) == 1
+        self.typeahead_seed_file = os.environ.get('TYPEAHEAD_SEED_FILE', '')
+        self.typeahead_max_entries = _env_int('TYPEAHEAD_MAX_ENTRIES', 50000)
+        self.typeahead_limit = _env_int('TYPEAHEAD_LIMIT', 8)
+        self.typeahead_min_count = _env_int('TYPEAHEAD_MIN_COUNT', 2)
+
+        # Response payloads: trim upstream answers to the fields the client
+        # reads, and compress larger bodies for clients that accept it
+        self.response_projection = _env_int('RESPONSE_PROJECTION', 1) == 1
+        self.compression_enabled = _env_int('COMPRESSION_ENABLED', 1) == 1
+        self.compression_min_bytes = _env_int('COMPRESSION_MIN_BYTES', 1024)
+        self.log_response_savings = _env_int('LOG_RESPONSE_SAVINGS', 1) == 1
+
+        # Request journal: chat exchanges appended to compressed, indexed segments
+        self.journal_enabled = _env_int('JOURNAL_ENABLED', 0) == 1
+        self.journal_dir = os.environ.get('JOURNAL_DIR', 'journal')
+        self.journal_batch_size = _env_int('JOURNAL_BATCH_SIZE', 256)
+        self.journal_flush_interval = _env_float('JOURNAL_FLUSH_INTERVAL', 1.0)
+        self.journal_max_pending = _env_int('JOURNAL_MAX_PENDING', 10000)
+        self.journal_segment_mb = _env_float('JOURNAL_SEGMENT_MB', 64.0)
+        self.journal_segment_seconds = _env_float('JOURNAL_SEGMENT_SECONDS', 3600.0)
+        self.journal_retention_hours = _env_float('JOURNAL_RETENTION_HOURS', 168.0)
+        self.journal_compress = _env_int('JOURNAL_COMPRESS', 1) == 1
+
+        # Last-known-good answers served while the breaker is open
+        self.fallback_cache_size = _env_int('FALLBACK_CACHE_SIZE', 1000)
+        self.fallback_message = os.environ.get(
+            'FALLBACK_MESSAGE',
+            "I'm having trouble reaching the search service right now. Please try again in a moment."
+        )
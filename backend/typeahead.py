@@ -0,0 +1,145 @@
+"""
+Typeahead suggestions built from query history
+
+Normalized queries are kept in a sorted array so a prefix maps to one
+contiguous bisect range; the best-ranked completions for short prefixes,
+whose ranges are the widest, are memoized and invalidated incrementally
+as new queries arrive. A query is only suggested once min_count
+distinct sessions have asked it, so one user's question (asked again,
+or retried by the client) is not shown to everyone else.
+"""
+
+import bisect
+import heapq
+import json
+import logging
+
+from .cache import normalize_query
+
+logger = logging.getLogger('atos_backend')
+
+# Fields that hold the user's question in a JSONL query log
+_QUERY_FIELDS = ('message', 'query', 'title')
+
+
+class SuggestionIndex:
+    """Frequency-ranked prefix index over past queries"""
+
+    def __init__(self, max_entries=50000, limit=8, memo_prefix_len=4, min_prefix_len=2, min_count=2):
+        self.max_entries = max_entries
+        self.limit = limit
+        self.memo_prefix_len = memo_prefix_len
+        self.min_prefix_len = min_prefix_len
+        self.min_count = min_count
+        self._keys = []
+        self._counts = {}
+        self._display = {}
+        # Insertion sequence of each key's latest sighting; breaks count ties
+        self._last_seen = {}
+        self._tick = 0
+        # Sessions that asked each key not yet seen min_count times
+        self._askers = {}
+        self._memo = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, text, count=1, session=None):
+        """Record a query; the index is updated in place
+
+        Live queries pass their session ('' when the client sent none);
+        until the query is eligible a session is counted once however
+        often it asks. Seeded queries pass no session and count as given.
+        """
+        key = normalize_query(text)
+        if len(key) < self.min_prefix_len:
+            return
+        if session is not None and self._counts.get(key, 0) < self.min_count:
+            askers = self._askers.setdefault(key, set())
+            if session in askers:
+                return
+            askers.add(session)
+        if key not in self._counts:
+            bisect.insort(self._keys, key)
+            self._counts[key] = 0
+        self._counts[key] += count
+        if self._counts[key] >= self.min_count:
+            self._askers.pop(key, None)
+        self._display[key] = ' '.join(text.split())
+        self._tick += 1
+        self._last_seen[key] = self._tick
+
+        for length in range(self.min_prefix_len, min(len(key), self.memo_prefix_len) + 1):
+            self._memo.pop(key[:length], None)
+
+        if len(self._keys) > self.max_entries * 1.1:
+            self._prune()
+
+    def _score(self, key):
+        return self._counts[key], self._last_seen[key]
+
+    def _prune(self):
+        # Recent queries win ties, so a new query is not evicted on arrival
+        # while the index is full of equally rare older ones
+        keep = heapq.nlargest(self.max_entries, self._counts, key=self._score)
+        keep_set = set(keep)
+        for key in list(self._counts):
+            if key not in keep_set:
+                del self._counts[key]
+                del self._display[key]
+                del self._last_seen[key]
+                self._askers.pop(key, None)
+        self._keys = sorted(keep)
+        self._memo.clear()
+
+    def _rank(self, prefix, limit):
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + '\uffff', lo=start)
+        eligible = (key for key in self._keys[start:end] if self._counts[key] >= self.min_count)
+        return heapq.nlargest(limit, eligible, key=self._score)
+
+    def suggest(self, prefix, limit=None):
+        """Most frequent past queries starting with prefix"""
+        limit = min(limit or self.limit, self.limit)
+        normalized = normalize_query(prefix)
+        # Keep a trailing space so "vpn " does not match "vpnclient"
+        if prefix[-1:].isspace() and normalized:
+            normalized += ' '
+        if len(normalized) < self.min_prefix_len:
+            return []
+
+        if len(normalized) <= self.memo_prefix_len:
+            ranked = self._memo.get(normalized)
+            if ranked is None:
+                ranked = self._memo[normalized] = self._rank(normalized, self.limit)
+        else:
+            ranked = self._rank(normalized, limit)
+        return [self._display[key] for key in ranked[:limit]]
+
+    def load_jsonl(self, path):
+        """Seed the index from a JSONL query log; returns the number of queries read
+
+        An integer "count" field adds that many sightings, e.g. for a
+        curated list of common questions.
+        """
+        loaded = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(record, dict):
+                    continue
+                text = next((record[field] for field in _QUERY_FIELDS
+                             if isinstance(record.get(field), str)), None)
+                count = record.get('count')
+                if not isinstance(count, int) or count < 1:
+                    count = 1
+                if text:
+                    self.add(text, count)
+                    loaded += 1
+        return loaded
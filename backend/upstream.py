@@ -0,0 +1,130 @@
+"""
+Minimal asyncio HTTP/1.1 client for the Copilot Studio API
+
+Built on asyncio streams rather than a thread pool so that an in-flight
+request can be cancelled and its connection released immediately.
+"""
+
+import asyncio
+import json
+import ssl
+from urllib.parse import urlsplit
+
+
+class UpstreamError(Exception):
+    """Raised when the upstream call fails or returns a non-2xx status"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class UpstreamResponse:
+    """Status, headers and raw body of an upstream reply"""
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body.decode('utf-8'))
+
+
+_ssl_context = None
+
+
+def _get_ssl_context():
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+async def _read_headers(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise UpstreamError("Upstream closed the connection without a response")
+    parts = status_line.decode('latin-1').split(' ', 2)
+    if len(parts) < 2:
+        raise UpstreamError(f"Malformed upstream status line: {status_line!r}")
+    status = int(parts[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+
+async def _read_body(reader, headers):
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b';', 1)[0].strip() or b'0', 16)
+            if size == 0:
+                # Drain trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        return b''.join(chunks)
+    if 'content-length' in headers:
+        return await reader.readexactly(int(headers['content-length']))
+    return await reader.read()
+
+
+async def post_json(url, payload, headers=None):
+    """POST a JSON payload and return the UpstreamResponse
+
+    Cancelling the awaiting task closes the connection.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise UpstreamError(f"Unsupported upstream URL: {url!r}")
+    secure = parts.scheme == 'https'
+    port = parts.port or (443 if secure else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+
+    body = json.dumps(payload).encode('utf-8')
+    request_headers = {
+        'Host': parts.netloc,
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+        'Content-Length': str(len(body)),
+        'Connection': 'close',
+    }
+    request_headers.update(headers or {})
+    head = f"POST {path} HTTP/1.1\r\n" + ''.join(
+        f"{name}: {value}\r\n" for name, value in request_headers.items()
+    ) + "\r\n"
+
+    try:
+        reader, writer = await asyncio.open_connection(
+            parts.hostname, port,
+            ssl=_get_ssl_context() if secure else None,
+            server_hostname=parts.hostname if secure else None,
+        )
+    except OSError as e:
+        raise UpstreamError(f"Could not connect to upstream: {e}") from e
+
+    try:
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+        status, response_headers = await _read_headers(reader)
+        response_body = await _read_body(reader, response_headers)
+    except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+        raise UpstreamError(f"Upstream request failed: {e}") from e
+    finally:
+        writer.close()
+
+    if not 200 <= status < 300:
+        raise UpstreamError(f"Upstream returned HTTP {status}", status=status)
+    return UpstreamResponse(status, response_headers, response_body)
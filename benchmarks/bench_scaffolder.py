@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Scaffolder Benchmark Suite
+Times setup_atos_chatbot.py against a fake node/npm/npx/git toolchain
+
+The fake executables are put first on PATH with scripted latencies and
+outputs, so runs are hermetic and repeatable offline. Results are appended
+to a JSON history file and compared with the previous run.
+
+Usage:
+  python benchmarks/bench_scaffolder.py
+  python benchmarks/bench_scaffolder.py --repeat 10 --latency-scale 0
+  python benchmarks/bench_scaffolder.py --fail-on-regression --threshold 15
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import setup_atos_chatbot as scaffolder  # noqa: E402
+from setup_atos_chatbot import Colors  # noqa: E402
+
+DEFAULT_HISTORY = Path(__file__).resolve().parent / 'history.json'
+
+# Latency (seconds) and stdout of each fake tool, roughly matching a warm
+# npm cache on a developer laptop
+FAKE_TOOLS = {
+    'node': {'latency': 0.02, 'output': 'v18.19.0'},
+    'npm': {'latency': 0.25, 'output': '10.2.3'},
+    'npx': {'latency': 0.15, 'output': 'Created Tailwind CSS config file: tailwind.config.js'},
+    'git': {'latency': 0.01, 'output': 'git version 2.43.0'},
+}
+
+FAKE_ASSET_MANIFEST = {
+    'files': {
+        'main.css': './static/css/main.1f2e3d4c.css',
+        'main.js': './static/js/main.5a6b7c8d.js',
+        'static/js/453.9e8f7a6b.chunk.js': './static/js/453.9e8f7a6b.chunk.js',
+        'index.html': './index.html',
+        'main.css.map': './static/css/main.1f2e3d4c.css.map',
+        'main.js.map': './static/js/main.5a6b7c8d.js.map',
+    },
+    'entrypoints': ['static/css/main.1f2e3d4c.css', 'static/js/main.5a6b7c8d.js'],
+}
+
+
+def install_fake_toolchain(bin_dir, latency_scale=1.0, tools=None):
+    """Write fake tool scripts into bin_dir"""
+    for name, spec in (tools or FAKE_TOOLS).items():
+        latency = spec['latency'] * latency_scale
+        script = bin_dir / name
+        lines = ['#!/bin/sh']
+        if latency > 0:
+            lines.append(f'sleep {latency:.4f}')
+        lines.append(f"echo '{spec['output']}'")
+        lines.append(f"exit {spec.get('exit_code', 0)}")
+        script.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        script.chmod(0o755)
+
+
+@contextlib.contextmanager
+def hermetic_environment(latency_scale):
+    """Fake toolchain first on PATH, silenced stdout"""
+    with tempfile.TemporaryDirectory(prefix='atos-bench-bin-') as bin_dir:
+        install_fake_toolchain(Path(bin_dir), latency_scale)
+        original_path = os.environ.get('PATH', '')
+        os.environ['PATH'] = bin_dir + os.pathsep + original_path
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                yield
+        finally:
+            os.environ['PATH'] = original_path
+
+
+@contextlib.contextmanager
+def project_dir(prepared=True):
+    """Temporary project directory, optionally with the folder layout in place"""
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='atos-bench-project-') as path:
+        os.chdir(path)
+        try:
+            if prepared:
+                scaffolder.create_folder_structure()
+            yield Path(path)
+        finally:
+            os.chdir(original_cwd)
+
+
+def time_call(func, repeat, setup=None):
+    """Run func repeat times and return the timings in seconds"""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def write_fake_build():
+    Path('build').mkdir(exist_ok=True)
+    with open('build/asset-manifest.json', 'w', encoding='utf-8') as f:
+        json.dump(FAKE_ASSET_MANIFEST, f)
+
+
+def bench_steps(repeat):
+    """Time check_prerequisites and each create_* step"""
+    results = {}
+    results['check_prerequisites'] = time_call(scaffolder.check_prerequisites, repeat)
+
+    steps = [
+        scaffolder.create_folder_structure,
+        scaffolder.create_package_json,
+        scaffolder.create_react_component,
+        scaffolder.create_config_files,
+        scaffolder.create_environment_files,
+        scaffolder.create_github_workflows,
+        scaffolder.create_gitignore,
+        scaffolder.create_readme,
+    ]
+    with project_dir():
+        for step in steps:
+            results[step.__name__] = time_call(step, repeat)
+
+        write_fake_build()
+        results['generate_service_worker'] = time_call(scaffolder.generate_service_worker, repeat)
+    return results
+
+
+def bench_main(repeat):
+    """Time full main() runs in a fresh directory (cold) and a populated one (warm)"""
+    results = {}
+
+    cold = []
+    for _ in range(repeat):
+        with project_dir(prepared=False):
+            cold.extend(time_call(lambda: scaffolder.main([]), 1))
+    results['main_cold'] = cold
+
+    with project_dir(prepared=False):
+        scaffolder.main([])
+        results['main_warm'] = time_call(lambda: scaffolder.main([]), repeat)
+    return results
+
+
+def summarize(timings):
+    return {
+        'runs': len(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'min': min(timings),
+        'max': max(timings),
+    }
+
+
+def git_revision():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=REPO_ROOT, capture_output=True, text=True
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def load_history(path):
+    if not path.exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_history(path, history):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+
+
+def compare(current, baseline, threshold):
+    """Print a comparison table and return the names of regressed benchmarks"""
+    regressions = []
+    print(f"{'benchmark':<28}{'median':>12}{'baseline':>12}{'change':>10}")
+    for name, stats in current.items():
+        median_ms = stats['median'] * 1000
+        base = (baseline or {}).get(name)
+        if not base:
+            print(f"{name:<28}{median_ms:>10.2f}ms{'-':>12}{'-':>10}")
+            continue
+        base_ms = base['median'] * 1000
+        change = (median_ms - base_ms) / base_ms * 100 if base_ms else 0.0
+        color = ''
+        if change > threshold:
+            color = Colors.RED
+            regressions.append(name)
+        elif change < -threshold:
+            color = Colors.GREEN
+        print(f"{color}{name:<28}{median_ms:>10.2f}ms{base_ms:>10.2f}ms{change:>+9.1f}%{Colors.END if color else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Atos Chatbot scaffolder")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per benchmark")
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help="Multiplier for fake tool latencies (0 measures pure Python overhead)")
+    parser.add_argument('--history', type=Path, default=DEFAULT_HISTORY, help="JSON history file")
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help="Percent change in median reported as a regression/improvement")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--no-save', action='store_true', help="Do not append this run to the history")
+    args = parser.parse_args(argv)
+
+    with hermetic_environment(args.latency_scale):
+        raw = bench_steps(args.repeat)
+        raw.update(bench_main(args.repeat))
+
+    results = {name: summarize(timings) for name, timings in raw.items()}
+    record = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'latency_scale': args.latency_scale,
+        'fake_tools': FAKE_TOOLS,
+        'results': results,
+    }
+
+    history = load_history(args.history)
+    # Only compare against runs made with the same fake toolchain settings
+    baseline = next(
+        (entry for entry in reversed(history)
+         if entry.get('latency_scale') == args.latency_scale and entry.get('fake_tools') == FAKE_TOOLS),
+        None
+    )
+    if baseline:
+        print(f"Baseline: {baseline['timestamp']} ({baseline.get('revision') or 'unknown revision'})")
+    regressions = compare(results, baseline and baseline['results'], args.threshold)
+
+    if not args.no_save:
+        history.append(record)
+        save_history(args.history, history)
+        print(f"Results appended to {args.history}")
+
+    if regressions and args.fail_on_regression:
+        print(f"{Colors.RED}Regressions: {', '.join(regressions)}{Colors.END}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,13 @@ import sys
 import subprocess
 import json
 import shutil
+import hashlib
+import argparse
+import importlib
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 from pathlib import Path
 
 class Colors:
@@ -108,9 +115,11 @@ def create_package_json():
         "scripts": {
             "start": "react-scripts start",
             "build": "react-scripts build",
+            "postbuild": "python3 setup_atos_chatbot.py service-worker || python setup_atos_chatbot.py service-worker || echo Service worker not generated, the app works without it",
             "test": "react-scripts test",
             "eject": "react-scripts eject",
-            "deploy": "npm run build && gh-pages -d build"
+            "deploy": "npm run build && gh-pages -d build",
+            "deploy:delta": "npm run build && (python3 setup_atos_chatbot.py deploy || python setup_atos_chatbot.py deploy)"
         },
         "eslintConfig": {
             "extends": [
@@ -147,7 +156,93 @@ def create_react_component():
     print_status("Creating React component...")
     
     component_code = '''import React, { useState, useRef, useEffect } from 'react';
-import { Send, Search, Bot, User } from 'lucide-react';
+import { Send, Search, Bot, User, Square } from 'lucide-react';
+
+// Per-attempt timeout. Keep it above the backend's UPSTREAM_TIMEOUT (30s)
+// so its timeout answer arrives before the client gives up on the attempt.
+const REQUEST_TIMEOUT_MS = Number(process.env.REACT_APP_REQUEST_TIMEOUT_MS) || 35000;
+// Overall deadline across attempts; a slow answer must never leave the user stuck
+const REQUEST_DEADLINE_MS = Number(process.env.REACT_APP_REQUEST_DEADLINE_MS) || 45000;
+const MAX_RETRIES = 2;
+const RETRY_BASE_DELAY_MS = 500;
+const MIN_ATTEMPT_MS = 2000;
+const RETRYABLE_STATUSES = [429, 502, 503, 504];
+
+// Typeahead: GET <endpoint>?q=<prefix> -> { suggestions: [...] }
+const SUGGEST_ENDPOINT = process.env.REACT_APP_SUGGEST_API_ENDPOINT;
+const SUGGEST_DEBOUNCE_MS = 150;
+const SUGGEST_MIN_CHARS = 3;
+
+class RequestTimeoutError extends Error {
+  constructor(timeoutMs) {
+    super(`Request timed out after ${Math.round(timeoutMs / 1000)}s`);
+    this.name = 'RequestTimeoutError';
+  }
+}
+
+const sleep = (ms, signal) => new Promise((resolve, reject) => {
+  const onAbort = () => {
+    clearTimeout(timer);
+    reject(new DOMException('Aborted', 'AbortError'));
+  };
+  const timer = setTimeout(() => {
+    signal.removeEventListener('abort', onAbort);
+    resolve();
+  }, ms);
+  signal.addEventListener('abort', onAbort, { once: true });
+});
+
+// POST JSON with a timeout per attempt, an overall deadline, and
+// exponential backoff on network errors and retryable statuses. Timeouts
+// are not retried: the backend already hedges slow upstream calls and
+// answers by its own deadline, so a retry would only restart the wait.
+// Aborting `signal` cancels the attempt in flight and releases its connection.
+const postJsonWithRetry = async (url, payload, headers, signal) => {
+  const startedAt = Date.now();
+  const deadline = startedAt + REQUEST_DEADLINE_MS;
+  for (let attempt = 0; ; attempt++) {
+    const controller = new AbortController();
+    let timedOut = false;
+    const timer = setTimeout(() => {
+      timedOut = true;
+      controller.abort();
+    }, Math.min(REQUEST_TIMEOUT_MS, deadline - Date.now()));
+    const onAbort = () => controller.abort();
+    signal.addEventListener('abort', onAbort, { once: true });
+
+    try {
+      const response = await fetch(url, {
+        method: 'POST',
+        headers,
+        body: JSON.stringify(payload),
+        signal: controller.signal
+      });
+
+      if (!response.ok) {
+        const error = new Error(`API Error: ${response.status} ${response.statusText}`);
+        error.retryable = RETRYABLE_STATUSES.includes(response.status);
+        throw error;
+      }
+
+      return await response.json();
+    } catch (error) {
+      controller.abort();
+      if (signal.aborted) throw error;
+      if (timedOut) throw new RequestTimeoutError(Date.now() - startedAt);
+
+      const retryable = error.retryable || error instanceof TypeError;
+      const base = RETRY_BASE_DELAY_MS * 2 ** attempt;
+      const delay = base + Math.random() * base / 2;
+      if (!retryable || attempt >= MAX_RETRIES || Date.now() + delay + MIN_ATTEMPT_MS > deadline) {
+        throw error;
+      }
+      await sleep(delay, signal);
+    } finally {
+      clearTimeout(timer);
+      signal.removeEventListener('abort', onAbort);
+    }
+  }
+};
 
 const AtosChatbot = () => {
   const [messages, setMessages] = useState([
@@ -160,7 +255,12 @@ const AtosChatbot = () => {
   ]);
   const [inputValue, setInputValue] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  const [suggestions, setSuggestions] = useState([]);
   const messagesEndRef = useRef(null);
+  const abortControllerRef = useRef(null);
+  const latestRequestIdRef = useRef(0);
+  // One id per chat session; the backend counts distinct sessions per question
+  const sessionIdRef = useRef(`session-${Date.now()}-${Math.random().toString(36).slice(2)}`);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -170,8 +270,55 @@ const AtosChatbot = () => {
     scrollToBottom();
   }, [messages]);
 
+  // Release the connection of any in-flight request on unmount
+  useEffect(() => () => abortControllerRef.current?.abort(), []);
+
+  // Debounced suggestions; each keystroke cancels the previous lookup
+  useEffect(() => {
+    const query = inputValue.trim();
+    if (!SUGGEST_ENDPOINT || query.length < SUGGEST_MIN_CHARS) {
+      setSuggestions([]);
+      return undefined;
+    }
+
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(`${SUGGEST_ENDPOINT}?q=${encodeURIComponent(inputValue)}`, {
+          signal: controller.signal
+        });
+        if (!response.ok) return;
+        const data = await response.json();
+        setSuggestions((data.suggestions || []).filter(
+          (suggestion) => suggestion.toLowerCase() !== query.toLowerCase()
+        ));
+      } catch (error) {
+        if (error.name !== 'AbortError') setSuggestions([]);
+      }
+    }, SUGGEST_DEBOUNCE_MS);
+
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [inputValue]);
+
+  const cancelRequest = () => {
+    abortControllerRef.current?.abort();
+    abortControllerRef.current = null;
+    // Any response still on its way is now stale
+    latestRequestIdRef.current += 1;
+    setIsLoading(false);
+  };
+
   const handleSendMessage = async () => {
-    if (!inputValue.trim() || isLoading) return;
+    if (!inputValue.trim()) return;
+
+    // A newer question supersedes the one in flight
+    abortControllerRef.current?.abort();
+    const controller = new AbortController();
+    abortControllerRef.current = controller;
+    const requestId = ++latestRequestIdRef.current;
 
     const userMessage = {
       id: Date.now(),
@@ -188,30 +335,23 @@ const AtosChatbot = () => {
     try {
       // TODO: Replace with your actual Copilot Studio Agent API endpoint
       const API_ENDPOINT = process.env.REACT_APP_COPILOT_API_ENDPOINT || 'YOUR_COPILOT_STUDIO_ENDPOINT_HERE';
-      
-      const response = await fetch(API_ENDPOINT, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          // Add any required headers for Copilot Studio API
-          // 'Authorization': `Bearer ${process.env.REACT_APP_API_KEY}`,
-          // 'Ocp-Apim-Subscription-Key': process.env.REACT_APP_SUBSCRIPTION_KEY,
-        },
-        body: JSON.stringify({
-          message: currentInput,
-          // Add other required parameters for Copilot Studio
-          sessionId: `session-${Date.now()}`, // Generate or maintain session ID
-          // userId: 'user-id', // If required
-          // channelId: 'web-chat', // If required
-        })
-      });
 
-      if (!response.ok) {
-        throw new Error(`API Error: ${response.status} ${response.statusText}`);
-      }
+      const data = await postJsonWithRetry(API_ENDPOINT, {
+        message: currentInput,
+        // Add other required parameters for Copilot Studio
+        sessionId: sessionIdRef.current,
+        // userId: 'user-id', // If required
+        // channelId: 'web-chat', // If required
+      }, {
+        'Content-Type': 'application/json',
+        // Add any required headers for Copilot Studio API
+        // 'Authorization': `Bearer ${process.env.REACT_APP_API_KEY}`,
+        // 'Ocp-Apim-Subscription-Key': process.env.REACT_APP_SUBSCRIPTION_KEY,
+      }, controller.signal);
+
+      // Drop answers that arrive after a newer question or a cancel
+      if (requestId !== latestRequestIdRef.current) return;
 
-      const data = await response.json();
-      
       // Extract response content - adjust based on Copilot Studio response format
       const botResponse = data.message || data.response || data.content || 'I apologize, but I received an unexpected response format.';
 
@@ -224,6 +364,8 @@ const AtosChatbot = () => {
 
       setMessages(prev => [...prev, assistantMessage]);
     } catch (error) {
+      if (controller.signal.aborted || requestId !== latestRequestIdRef.current) return;
+
       console.error('API Error:', error);
       
       const errorMessage = {
@@ -235,7 +377,10 @@ const AtosChatbot = () => {
 
       setMessages(prev => [...prev, errorMessage]);
     } finally {
-      setIsLoading(false);
+      if (requestId === latestRequestIdRef.current) {
+        abortControllerRef.current = null;
+        setIsLoading(false);
+      }
     }
   };
 
@@ -331,6 +476,21 @@ const AtosChatbot = () => {
         <div className="p-4 bg-white border-t border-blue-200">
           <div className="flex gap-3 items-end">
             <div className="flex-1 relative">
+              {suggestions.length > 0 && (
+                <ul className="absolute bottom-full left-0 right-0 mb-2 bg-white border border-blue-200 rounded-2xl shadow-lg overflow-hidden z-10">
+                  {suggestions.map((suggestion) => (
+                    <li key={suggestion}>
+                      <button
+                        type="button"
+                        onClick={() => setInputValue(suggestion)}
+                        className="w-full text-left px-4 py-2 text-gray-700 hover:bg-blue-50"
+                      >
+                        {suggestion}
+                      </button>
+                    </li>
+                  ))}
+                </ul>
+              )}
               <textarea
                 value={inputValue}
                 onChange={(e) => setInputValue(e.target.value)}
@@ -346,12 +506,21 @@ const AtosChatbot = () => {
                   e.target.style.height = 'auto';
                   e.target.style.height = Math.min(e.target.scrollHeight, 128) + 'px';
                 }}
-                disabled={isLoading}
               />
             </div>
+            {isLoading && (
+              <button
+                onClick={cancelRequest}
+                title="Stop"
+                aria-label="Stop"
+                className="bg-white border border-blue-200 hover:bg-blue-50 text-blue-600 p-4 rounded-2xl transition-all duration-200 shadow-md"
+              >
+                <Square className="w-5 h-5" />
+              </button>
+            )}
             <button
               onClick={handleSendMessage}
-              disabled={!inputValue.trim() || isLoading}
+              disabled={!inputValue.trim()}
               className="bg-gradient-to-r from-blue-600 to-blue-700 hover:from-blue-700 hover:to-blue-800 disabled:from-gray-400 disabled:to-gray-500 text-white p-4 rounded-2xl transition-all duration-200 shadow-lg hover:shadow-xl disabled:shadow-md"
             >
               <Send className="w-5 h-5" />
@@ -433,7 +602,16 @@ root.render(
   <React.StrictMode>
     <App />
   </React.StrictMode>
-);'''
+);
+
+// App-shell service worker generated by `npm run build` (postbuild)
+if ('serviceWorker' in navigator && process.env.NODE_ENV === 'production') {
+  window.addEventListener('load', () => {
+    navigator.serviceWorker
+      .register(`${process.env.PUBLIC_URL}/service-worker.js`)
+      .catch((error) => console.error('Service worker registration failed:', error));
+  });
+}'''
     
     with open('src/index.js', 'w', encoding='utf-8') as f:
         f.write(index_js)
@@ -503,6 +681,9 @@ def create_environment_files():
 REACT_APP_COPILOT_API_ENDPOINT=https://your-copilot-studio-endpoint.com/api/chat
 REACT_APP_API_KEY=your-api-key-here
 REACT_APP_SUBSCRIPTION_KEY=your-subscription-key-here
+REACT_APP_REQUEST_TIMEOUT_MS=35000
+REACT_APP_REQUEST_DEADLINE_MS=45000
+REACT_APP_SUGGEST_API_ENDPOINT=http://localhost:8080/api/suggest
 
 # Optional: Application Configuration
 REACT_APP_APP_NAME=Atos AI Assistant
@@ -515,6 +696,9 @@ REACT_APP_VERSION=1.0.0'''
 REACT_APP_COPILOT_API_ENDPOINT=YOUR_COPILOT_STUDIO_ENDPOINT_HERE
 REACT_APP_API_KEY=your-actual-api-key
 REACT_APP_SUBSCRIPTION_KEY=your-actual-subscription-key
+REACT_APP_REQUEST_TIMEOUT_MS=35000
+REACT_APP_REQUEST_DEADLINE_MS=45000
+REACT_APP_SUGGEST_API_ENDPOINT=
 
 # Optional: Application Configuration
 REACT_APP_APP_NAME=Atos AI Assistant
@@ -784,6 +968,9 @@ Create a `.env` file with the following variables:
 REACT_APP_COPILOT_API_ENDPOINT=https://your-copilot-studio-endpoint.com/api/chat
 REACT_APP_API_KEY=your-api-key-here
 REACT_APP_SUBSCRIPTION_KEY=your-subscription-key-here
+REACT_APP_REQUEST_TIMEOUT_MS=35000
+REACT_APP_REQUEST_DEADLINE_MS=45000
+REACT_APP_SUGGEST_API_ENDPOINT=http://localhost:8080/api/suggest
 ```
 
 ### Copilot Studio Integration
@@ -840,8 +1027,288 @@ For technical support, please contact the development team or raise an issue in
     
     print_success("README.md created")
 
-def main():
-    """Main automation function"""
+SERVICE_WORKER_TEMPLATE = '''/* Generated by setup_atos_chatbot.py from asset-manifest.json - do not edit */
+const CACHE_PREFIX = 'atos-shell-';
+const CACHE_NAME = CACHE_PREFIX + '__VERSION__';
+const PRECACHE_PATHS = __PRECACHE_PATHS__;
+
+// Chat API and Copilot Studio traffic always goes to the network
+const NEVER_CACHE_PREFIXES = ['/api/', '/metrics', '/stats'];
+
+const toUrl = (path) => new URL(path, self.registration.scope).href;
+const PRECACHE_URLS = new Set(PRECACHE_PATHS.map(toUrl));
+const SHELL_URL = toUrl('./index.html');
+
+// No skipWaiting: a new worker activates only once every tab of the old
+// build is closed, so the old cache (and its lazy chunks) outlives them.
+self.addEventListener('install', (event) => {
+  event.waitUntil(
+    caches.open(CACHE_NAME)
+      .then((cache) => cache.addAll([...PRECACHE_URLS]))
+  );
+});
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil(
+    caches.keys()
+      .then((keys) => Promise.all(
+        keys
+          .filter((key) => key.startsWith(CACHE_PREFIX) && key !== CACHE_NAME)
+          .map((key) => caches.delete(key))
+      ))
+      .then(() => self.clients.claim())
+  );
+});
+
+self.addEventListener('fetch', (event) => {
+  const { request } = event;
+  if (request.method !== 'GET') return;
+
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) return;
+  if (NEVER_CACHE_PREFIXES.some((prefix) => url.pathname.startsWith(prefix))) return;
+
+  // App shell: cache-first. A new build changes this file, which installs
+  // a fresh cache and drops the old one on activate. Only client-side
+  // routes (no file extension) fall back to index.html; /robots.txt and
+  // other files are left to the network.
+  const lastSegment = url.pathname.split('/').pop();
+  const isRoute = request.mode === 'navigate' && !lastSegment.includes('.');
+  const cacheUrl = isRoute ? SHELL_URL : url.origin + url.pathname;
+  if (!PRECACHE_URLS.has(cacheUrl)) return;
+
+  event.respondWith(
+    caches.open(CACHE_NAME)
+      .then((cache) => cache.match(cacheUrl))
+      .then((cached) => cached || fetch(request))
+  );
+});
+'''
+
+def generate_service_worker(build_dir='build'):
+    """Generate build/service-worker.js from build/asset-manifest.json"""
+    print_status("Generating service worker...")
+
+    manifest_path = Path(build_dir) / 'asset-manifest.json'
+    if not manifest_path.exists():
+        print_error(f"{manifest_path} not found - run npm run build first")
+        return False
+
+    manifest_bytes = manifest_path.read_bytes()
+    manifest = json.loads(manifest_bytes.decode('utf-8'))
+
+    precache_paths = []
+    for path in manifest.get('files', {}).values():
+        if path.endswith(('.map', '.LICENSE.txt')):
+            continue
+        # CRA writes '/static/...' or './static/...' depending on "homepage";
+        # both resolve correctly against the service worker scope
+        precache_paths.append(path)
+    if not any(path.endswith('/index.html') for path in precache_paths):
+        precache_paths.append('./index.html')
+
+    # index.html is precached too; an edit to public/index.html alone leaves
+    # the asset manifest unchanged but must still roll out a new worker
+    index_path = Path(build_dir) / 'index.html'
+    index_bytes = index_path.read_bytes() if index_path.exists() else b''
+    version = hashlib.sha256(
+        manifest_bytes + index_bytes + SERVICE_WORKER_TEMPLATE.encode('utf-8')
+    ).hexdigest()[:12]
+    service_worker = (SERVICE_WORKER_TEMPLATE
+                      .replace('__VERSION__', version)
+                      .replace('__PRECACHE_PATHS__', json.dumps(sorted(precache_paths), indent=2)))
+
+    with open(Path(build_dir) / 'service-worker.js', 'w', encoding='utf-8') as f:
+        f.write(service_worker)
+    print_success(f"Service worker created ({len(precache_paths)} precached files, version {version})")
+    return True
+
+DEPLOY_MANIFEST_NAME = '.deploy-manifest.json'
+
+# Entry points reference the hashed assets, so they go up after everything
+# else; a visitor never gets an index.html whose chunks are not there yet
+DEPLOY_LAST_FILES = ('service-worker.js', 'asset-manifest.json')
+
+class DeployTarget(ABC):
+    """Where a build is deployed; subclass this to add a new target"""
+
+    @abstractmethod
+    def read_manifest(self):
+        """Return the manifest of the last deploy, or None"""
+
+    @abstractmethod
+    def write_manifest(self, manifest):
+        pass
+
+    @abstractmethod
+    def upload(self, relative_path, local_path):
+        """Upload one file; called from several threads at once"""
+
+    @abstractmethod
+    def delete(self, relative_path):
+        pass
+
+    def describe(self):
+        return self.__class__.__name__
+
+class LocalDirectoryTarget(DeployTarget):
+    """Deploy into a directory (a mounted share, a web root, or a test fixture)"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def read_manifest(self):
+        path = self.root / DEPLOY_MANIFEST_NAME
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write_manifest(self, manifest):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / DEPLOY_MANIFEST_NAME
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def upload(self, relative_path, local_path):
+        destination = self.root / relative_path
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        # Copy then rename, so a reader never sees a half-written file
+        tmp_path = destination.with_name(f".{destination.name}.{os.getpid()}.tmp")
+        shutil.copyfile(local_path, tmp_path)
+        os.replace(tmp_path, destination)
+
+    def delete(self, relative_path):
+        try:
+            (self.root / relative_path).unlink()
+        except FileNotFoundError:
+            pass
+
+    def describe(self):
+        return f"local directory {self.root}"
+
+# Target schemes accepted by --target <scheme>:<location>
+DEPLOY_TARGETS = {
+    'local': LocalDirectoryTarget,
+}
+
+def load_deploy_target(spec, target_class=None):
+    """Build a target from '<scheme>:<location>', or a 'module:Class' plugin given the location"""
+    if target_class:
+        module_name, _, class_name = target_class.partition(':')
+        module = importlib.import_module(module_name)
+        return getattr(module, class_name)(spec)
+    scheme, _, location = spec.partition(':')
+    if scheme not in DEPLOY_TARGETS or not location:
+        raise ValueError(f"Unknown deploy target '{spec}' - expected one of: "
+                         + ', '.join(f"{name}:<location>" for name in DEPLOY_TARGETS))
+    return DEPLOY_TARGETS[scheme](location)
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def build_manifest(build_dir):
+    """Content hash and size of every file under build_dir, keyed by POSIX path"""
+    build_path = Path(build_dir)
+    files = {}
+    for path in sorted(build_path.rglob('*')):
+        if not path.is_file():
+            continue
+        relative_path = path.relative_to(build_path).as_posix()
+        if relative_path == DEPLOY_MANIFEST_NAME:
+            continue
+        files[relative_path] = {'sha256': hash_file(path), 'size': path.stat().st_size}
+    return {'version': 1, 'files': files}
+
+def diff_manifests(previous, current):
+    """Return (added, changed, removed) relative paths"""
+    old_files = (previous or {}).get('files', {})
+    new_files = current['files']
+    added = sorted(set(new_files) - set(old_files))
+    removed = sorted(set(old_files) - set(new_files))
+    changed = sorted(path for path in set(new_files) & set(old_files)
+                     if new_files[path]['sha256'] != old_files[path]['sha256'])
+    return added, changed, removed
+
+def _format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def _deploy_last(relative_path):
+    return relative_path.endswith('.html') or relative_path in DEPLOY_LAST_FILES
+
+def _upload_all(target, build_dir, paths, jobs):
+    failures = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(target.upload, path, Path(build_dir) / path): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failures.append(futures[future])
+                print_error(f"Upload failed for {futures[future]}: {e}")
+    return failures
+
+def deploy_build(target, build_dir='build', jobs=8, full=False, dry_run=False):
+    """Upload only the files that changed since the last deploy to target"""
+    print_status(f"Deploying {build_dir}/ to {target.describe()}...")
+
+    if not Path(build_dir).is_dir():
+        print_error(f"{build_dir}/ not found - run npm run build first")
+        return False
+
+    started = time.time()
+    current = build_manifest(build_dir)
+    # Read even for --full: removals still have to be computed, or files
+    # dropped from the build would never be deleted from the target
+    previous = target.read_manifest()
+    added, changed, removed = diff_manifests(previous, current)
+
+    files = current['files']
+    to_upload = sorted(files) if full else added + changed
+    full_bytes = sum(entry['size'] for entry in files.values())
+    upload_bytes = sum(files[path]['size'] for path in to_upload)
+
+    print(f"  {len(added)} added, {len(changed)} changed, {len(removed)} removed, "
+          f"{len(files) - len(to_upload)} unchanged")
+    if dry_run:
+        for label, paths in (('+', added), ('~', changed), ('-', removed)):
+            for path in paths:
+                print(f"  {label} {path}")
+        print_success(f"Dry run: would upload {_format_bytes(upload_bytes)} of {_format_bytes(full_bytes)}")
+        return True
+
+    # Assets first, entry points second, deletions only once both are live
+    for phase in ([p for p in to_upload if not _deploy_last(p)], [p for p in to_upload if _deploy_last(p)]):
+        failures = _upload_all(target, build_dir, phase, jobs)
+        if failures:
+            print_error(f"{len(failures)} uploads failed - the previous manifest was kept, rerun to retry")
+            return False
+
+    for path in removed:
+        target.delete(path)
+
+    current['deployed_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    target.write_manifest(current)
+
+    saved = full_bytes - upload_bytes
+    percent = 100.0 * saved / full_bytes if full_bytes else 0.0
+    print_success(f"Deployed {len(to_upload)} of {len(files)} files in {time.time() - started:.1f}s: "
+                  f"uploaded {_format_bytes(upload_bytes)} instead of {_format_bytes(full_bytes)} "
+                  f"({_format_bytes(saved)} saved, {percent:.0f}%)")
+    return True
+
+def run_setup():
+    """Scaffold, install and build the complete project"""
     print_status("🎯 Atos Chatbot Deployment Automation Starting...")
     print_status("Current directory: " + os.getcwd())
     
@@ -913,7 +1380,55 @@ def main():
     print(f"{Colors.BLUE}npm start          {Colors.END}# Start development server")
     print(f"{Colors.BLUE}npm run build      {Colors.END}# Create production build")
     print(f"{Colors.BLUE}npm run deploy     {Colors.END}# Deploy to GitHub Pages")
+    print(f"{Colors.BLUE}npm run deploy:delta {Colors.END}# Upload changed files to $DEPLOY_TARGET")
     print(f"{Colors.BLUE}npm test           {Colors.END}# Run tests")
 
+def main(argv=None):
+    """Main automation function"""
+    # Windows consoles and CI pipes may use a legacy code page; never let the
+    # status emoji turn a successful step into a UnicodeEncodeError
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(errors='replace')
+    parser = argparse.ArgumentParser(description="Atos Chatbot Deployment Automation")
+    subparsers = parser.add_subparsers(dest='command')
+
+    sw_parser = subparsers.add_parser(
+        'service-worker', help="Generate the app-shell service worker from the build manifest"
+    )
+    sw_parser.add_argument('--build-dir', default='build', help="React build output directory")
+
+    deploy_parser = subparsers.add_parser(
+        'deploy', help="Upload only the build files that changed since the last deploy"
+    )
+    deploy_parser.add_argument('--build-dir', default='build', help="React build output directory")
+    deploy_parser.add_argument('--target', default=os.environ.get('DEPLOY_TARGET'),
+                               help="<scheme>:<location>, e.g. local:/var/www/chatbot (default: $DEPLOY_TARGET)")
+    deploy_parser.add_argument('--target-class', default=os.environ.get('DEPLOY_TARGET_CLASS'),
+                               help="module:Class of a custom DeployTarget, constructed with --target")
+    deploy_parser.add_argument('--jobs', type=int, default=8, help="Parallel uploads")
+    deploy_parser.add_argument('--full', action='store_true', help="Upload every file, not only changed ones; removed files are still deleted")
+    deploy_parser.add_argument('--dry-run', action='store_true', help="Show what would change without uploading")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'service-worker':
+        if not generate_service_worker(args.build_dir):
+            sys.exit(1)
+        return
+
+    if args.command == 'deploy':
+        if not args.target:
+            parser.error("deploy needs --target or DEPLOY_TARGET")
+        try:
+            target = load_deploy_target(args.target, args.target_class)
+        except (ValueError, ImportError, AttributeError) as e:
+            print_error(str(e))
+            sys.exit(1)
+        if not deploy_build(target, args.build_dir, jobs=max(1, args.jobs), full=args.full, dry_run=args.dry_run):
+            sys.exit(1)
+        return
+
+    run_setup()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
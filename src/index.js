@@ -8,4 +8,13 @@ root.render(
   <React.StrictMode>
     <App />
   </React.StrictMode>
-);
\ No newline at end of file
+);
+
+// App-shell service worker generated by `npm run build` (postbuild)
+if ('serviceWorker' in navigator && process.env.NODE_ENV === 'production') {
+  window.addEventListener('load', () => {
+    navigator.serviceWorker
+      .register(`${process.env.PUBLIC_URL}/service-worker.js`)
+      .catch((error) => console.error('Service worker registration failed:', error));
+  });
+}
\ No newline at end of file
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import backend/ and setup_atos_chatbot.py from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,111 @@
+import pytest
+
+from backend.cache import AnswerCache, NearDuplicateCache, anchor_tokens, cache_key, normalize_query
+
+
+@pytest.mark.parametrize('cached, asked', [
+    ("install python 3.11 on ubuntu", "install python 3.12 on ubuntu"),
+    ("vpn not working on windows 10", "vpn not working on windows 11"),
+])
+def test_different_versions_are_not_near_hits(cached, asked):
+    cache = NearDuplicateCache()
+    cache.add(cached, b'answer')
+
+    assert cache.lookup(asked) is None
+    assert cache.counters['near_hits'] == 0
+
+
+def test_rephrased_question_is_a_near_hit():
+    cache = NearDuplicateCache()
+    cache.add("how do I reset my VPN password", b'answer')
+
+    body, similarity = cache.lookup("reset vpn password how?")
+
+    assert body == b'answer'
+    assert similarity >= cache.threshold
+
+
+def test_typo_in_long_word_is_still_a_near_hit():
+    cache = NearDuplicateCache(threshold=0.6)
+    cache.add("configure outlook signature on windows 11", b'answer')
+
+    assert cache.lookup("configure outlook signatur on windows 11") is not None
+
+
+def test_anchor_tokens_are_short_and_numeric_words():
+    assert anchor_tokens("Install Python 3.11 on Ubuntu 22.04") == {'3', '11', '22', '04'}
+    assert anchor_tokens("vpn on win10") == {'vpn', 'win10'}
+
+
+def test_shadow_mode_never_serves_exact_or_near_matches():
+    cache = NearDuplicateCache(shadow=True)
+    cache.add("how do I reset my VPN password", b'answer')
+
+    assert cache.lookup("how do I reset my VPN password") is None
+    assert cache.lookup("reset vpn password how?") is None
+    assert cache.counters['exact_hits'] == 0
+    assert cache.counters['shadow_exact_matches'] == 1
+    assert cache.counters['shadow_near_matches'] == 1
+    assert cache.counters['misses'] == 2
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Как сбросить пароль VPN?", "как сбросить пароль vpn"),
+    ("Comment réinitialiser mon mot de passe", "comment réinitialiser mon mot de passe"),
+    ("Comment re\u0301initialiser", "comment réinitialiser"),
+    ("如何重置密码？", "如何重置密码"),
+    ("snake_case and ＶＰＮ", "snake case and vpn"),
+])
+def test_normalize_query_keeps_letters_of_any_script(text, expected):
+    assert normalize_query(text) == expected
+
+
+def test_non_latin_questions_get_distinct_keys():
+    keys = {normalize_query(q) for q in ("如何重置密码", "如何预订会议室", "Как удалить VPN клиент")}
+
+    assert len(keys) == 3
+    assert '' not in keys
+    cache = AnswerCache()
+    cache.put(normalize_query("如何重置密码"), b'reset')
+    assert cache.get(normalize_query("如何预订会议室")) is None
+
+
+@pytest.mark.parametrize('cached, asked', [
+    ("Как сбросить пароль VPN", "Как удалить VPN клиент"),
+    ("如何重置密码", "如何预订会议室"),
+    ("Comment réinitialiser mon mot de passe", "Comment réserver une salle de réunion"),
+])
+def test_different_non_latin_questions_do_not_share_an_answer(cached, asked):
+    cache = NearDuplicateCache()
+    cache.add(cached, b'answer')
+
+    assert cache.lookup(asked) is None
+    assert cache.lookup(cached) == (b'answer', 1.0)
+
+
+@pytest.mark.parametrize('cached, asked', [
+    ("Как сбросить пароль VPN", "как сбросить пароль vpn?"),
+    ("如何重置密码", "如何重置密码？"),
+    ("Comment réinitialiser mon mot de passe", "comment réinitialiser mon mot de passe"),
+])
+def test_non_latin_questions_hit_their_own_answer(cached, asked):
+    cache = NearDuplicateCache()
+    cache.add(cached, b'answer')
+
+    assert cache.lookup(asked) == (b'answer', 1.0)
+
+
+@pytest.mark.parametrize('text', ["vpn?", "help", "how do I?", "密", "???"])
+def test_queries_under_two_content_words_are_neither_cached_nor_served(text):
+    assert cache_key(text) == ''
+    cache = NearDuplicateCache()
+    cache.add(text, b'answer')
+
+    assert len(cache) == 0
+    assert cache.lookup(text) is None
+    assert cache.counters['too_short'] == 1
+
+
+def test_cjk_characters_count_as_words():
+    assert cache_key("密码") == "密码"
+    assert cache_key("reset vpn") == "reset vpn"
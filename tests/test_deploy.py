@@ -0,0 +1,132 @@
+import json
+import threading
+
+import pytest
+
+import setup_atos_chatbot as scaffolder
+from setup_atos_chatbot import DEPLOY_MANIFEST_NAME, DeployTarget, LocalDirectoryTarget, deploy_build
+
+
+class RecordingTarget(LocalDirectoryTarget):
+    def __init__(self, root, fail_on=()):
+        super().__init__(root)
+        self.fail_on = set(fail_on)
+        self.uploads = []
+        self._lock = threading.Lock()
+
+    def upload(self, relative_path, local_path):
+        with self._lock:
+            self.uploads.append(relative_path)
+        if relative_path in self.fail_on:
+            raise OSError("connection reset")
+        super().upload(relative_path, local_path)
+
+
+def write_build(build_dir, files):
+    for relative_path, content in files.items():
+        path = build_dir / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+
+
+@pytest.fixture
+def build(tmp_path):
+    build_dir = tmp_path / 'build'
+    write_build(build_dir, {
+        'index.html': '<script src="/static/js/main.1.js"></script>',
+        'service-worker.js': 'sw v1',
+        'static/js/main.1.js': 'main v1',
+        'static/css/main.css': 'body {}',
+        'old.js': 'stale',
+    })
+    return build_dir
+
+
+def deployed_files(root):
+    return sorted(
+        path.relative_to(root).as_posix() for path in root.rglob('*')
+        if path.is_file() and path.name != DEPLOY_MANIFEST_NAME
+    )
+
+
+def test_only_added_and_changed_files_are_uploaded_and_removed_files_deleted(build, tmp_path):
+    target = RecordingTarget(tmp_path / 'www')
+    assert deploy_build(target, str(build))
+
+    (build / 'old.js').unlink()
+    write_build(build, {'index.html': '<script src="/static/js/main.2.js"></script>',
+                        'static/js/main.2.js': 'main v2'})
+    target.uploads.clear()
+    assert deploy_build(target, str(build))
+
+    assert sorted(target.uploads) == ['index.html', 'static/js/main.2.js']
+    assert deployed_files(tmp_path / 'www') == deployed_files(build)
+    assert not (tmp_path / 'www' / 'old.js').exists()
+
+
+def test_full_deploy_still_deletes_removed_files(build, tmp_path):
+    target = RecordingTarget(tmp_path / 'www')
+    assert deploy_build(target, str(build))
+
+    (build / 'old.js').unlink()
+    assert deploy_build(target, str(build), full=True)
+    assert deploy_build(target, str(build))
+
+    assert sorted(target.uploads[-4:]) == deployed_files(build)
+    assert not (tmp_path / 'www' / 'old.js').exists()
+    assert 'old.js' not in target.read_manifest()['files']
+
+
+def test_entry_points_are_uploaded_after_assets(build, tmp_path):
+    target = RecordingTarget(tmp_path / 'www')
+    assert deploy_build(target, str(build), jobs=4)
+
+    last = {'index.html', 'service-worker.js'}
+    first_entry_point = min(target.uploads.index(path) for path in last)
+    assert set(target.uploads[first_entry_point:]) == last
+
+
+def test_failed_upload_keeps_previous_manifest(build, tmp_path):
+    target = RecordingTarget(tmp_path / 'www')
+    assert deploy_build(target, str(build))
+    manifest = target.read_manifest()
+
+    write_build(build, {'static/css/main.css': 'body { color: red }', 'index.html': 'v2'})
+    failing = RecordingTarget(tmp_path / 'www', fail_on={'static/css/main.css'})
+
+    assert not deploy_build(failing, str(build))
+    assert target.read_manifest() == manifest
+    # Entry points are never published over assets that failed to upload
+    assert 'index.html' not in failing.uploads
+    assert deploy_build(target, str(build))
+    assert sorted(target.uploads[-2:]) == ['index.html', 'static/css/main.css']
+
+
+def test_dry_run_changes_nothing(build, tmp_path, capsys):
+    www = tmp_path / 'www'
+
+    scaffolder.main(['deploy', '--build-dir', str(build), '--target', f'local:{www}', '--dry-run'])
+
+    assert not www.exists()
+    output = capsys.readouterr().out
+    assert '5 added, 0 changed, 0 removed' in output
+    assert '+ static/js/main.1.js' in output
+
+
+def test_manifest_records_hash_and_size(build, tmp_path):
+    target = LocalDirectoryTarget(tmp_path / 'www')
+    assert deploy_build(target, str(build))
+
+    with open(tmp_path / 'www' / DEPLOY_MANIFEST_NAME, encoding='utf-8') as f:
+        entry = json.load(f)['files']['service-worker.js']
+    assert entry['size'] == len('sw v1')
+    assert len(entry['sha256']) == 64
+
+
+def test_deploy_target_is_abstract():
+    class Incomplete(DeployTarget):
+        def upload(self, relative_path, local_path):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
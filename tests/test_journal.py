@@ -0,0 +1,103 @@
+import asyncio
+import errno
+import json
+import logging
+
+from backend.journal import JournalReader, RequestJournal, segment_paths, session_hash
+from backend.server import HttpResponse
+
+
+def exchange(ts, message, session='s1'):
+    request = json.dumps({'message': message, 'sessionId': session}).encode('utf-8')
+    return (ts, request, 200, 'upstream', b'{"message":"answer"}', 0.05)
+
+
+class PartialWriteFile:
+    """Writes half of the first block, then fails like a full disk"""
+
+    def __init__(self, f):
+        self._f = f
+
+    def write(self, data):
+        self._f.write(data[:len(data) // 2])
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+def test_records_round_trip_by_session_and_time(tmp_path):
+    async def run():
+        journal = RequestJournal(str(tmp_path), flush_interval=0.01)
+        await journal.start()
+        for i in range(6):
+            body = json.dumps({'message': f"question {i}", 'sessionId': f"s{i % 2}"}).encode('utf-8')
+            journal.record(body, HttpResponse(200, b'{"message":"ok"}', headers={'X-Atos-Source': 'upstream'}), 0.1)
+        await journal.stop()
+
+    asyncio.run(run())
+    reader = JournalReader(str(tmp_path))
+    records = list(reader.records())
+
+    assert [r['request']['message'] for r in records] == [f"question {i}" for i in range(6)]
+    assert [r['request']['message'] for r in reader.records(session='s1')] == [
+        "question 1", "question 3", "question 5",
+    ]
+    assert len(list(reader.records(start=records[2]['ts'], end=records[4]['ts']))) == 2
+
+
+def test_write_error_starts_a_new_segment(tmp_path, caplog):
+    journal = RequestJournal(str(tmp_path))
+    journal._write_batch([exchange(1000.0, "before")])
+    journal._data = PartialWriteFile(journal._data)
+
+    with caplog.at_level(logging.WARNING, logger='atos_backend'):
+        journal._write_batch([exchange(1001.0, "lost")])
+    journal._write_batch([exchange(1002.0, "after")])
+    journal._close_segment()
+
+    assert journal.counters['write_errors'] == 1
+    assert len(segment_paths(str(tmp_path))) == 2
+    messages = [r['request']['message'] for r in JournalReader(str(tmp_path)).records()]
+    assert messages == ["before", "after"]
+
+
+def test_reader_skips_damaged_blocks(tmp_path, caplog):
+    journal = RequestJournal(str(tmp_path), segment_seconds=10)
+    journal._write_batch([exchange(1000.0, "damaged")])
+    journal._write_batch([exchange(1020.0, "healthy")])
+    journal._close_segment()
+    damaged_path, _ = segment_paths(str(tmp_path))[0]
+    with open(damaged_path, 'r+b') as f:
+        f.seek(20)
+        f.write(b'\xff' * 16)
+
+    with caplog.at_level(logging.WARNING, logger='atos_backend'):
+        messages = [r['request']['message'] for r in JournalReader(str(tmp_path)).records()]
+
+    assert messages == ["healthy"]
+    assert "Skipping unreadable block" in caplog.text
+
+
+def test_closed_segment_has_session_index_sorted_by_session(tmp_path):
+    journal = RequestJournal(str(tmp_path))
+    journal._write_batch([exchange(1000.0 + i, f"question {i}", session=f"s{i % 3}") for i in range(9)])
+    journal._close_segment()
+    _, index_path = segment_paths(str(tmp_path))[0]
+    reader = JournalReader(str(tmp_path))
+
+    assert reader._session_entries(index_path, session_hash('s1'), 9) == [1, 4, 7]
+    assert reader._session_entries(index_path, session_hash('unknown'), 9) == []
+    messages = [r['request']['message'] for r in reader.records(start=1002.0, end=1008.0, session='s1')]
+    assert messages == ["question 4", "question 7"]
+
+
+def test_session_lookup_scans_the_segment_being_written(tmp_path):
+    journal = RequestJournal(str(tmp_path))
+    journal._write_batch([exchange(1000.0 + i, f"question {i}", session=f"s{i % 2}") for i in range(4)])
+    _, index_path = segment_paths(str(tmp_path))[0]
+    reader = JournalReader(str(tmp_path))
+
+    assert reader._session_entries(index_path, session_hash('s1'), 4) is None
+    assert [r['request']['message'] for r in reader.records(session='s1')] == ["question 1", "question 3"]
+    journal._close_segment()
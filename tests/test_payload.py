@@ -0,0 +1,110 @@
+import gzip
+import json
+
+import pytest
+
+from backend.payload import SUPPORTED_ENCODINGS, choose_encoding, project_answer
+from backend.server import ChatBackend, HttpRequest, HttpResponse
+
+
+@pytest.mark.parametrize('answer, text', [
+    ({'message': "Restart the VPN client", 'activities': [{'type': 'typing'}]}, "Restart the VPN client"),
+    ({'response': "Use the self-service portal", 'citations': ['kb-1']}, "Use the self-service portal"),
+    ({'message': '', 'content': "Ask the service desk"}, "Ask the service desk"),
+    ({'message': "Réinitialisez le mot de passe"}, "Réinitialisez le mot de passe"),
+])
+def test_project_answer_keeps_only_the_displayed_text(answer, text):
+    body = project_answer(json.dumps(answer).encode('utf-8'))
+
+    assert json.loads(body) == {'message': text}
+
+
+@pytest.mark.parametrize('body', [
+    b'not json',
+    b'["a list"]',
+    b'{"message": {"text": "nested"}}',
+    b'{"status": "ok"}',
+])
+def test_project_answer_returns_other_bodies_unchanged(body):
+    assert project_answer(body) is body
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip', 'gzip'),
+    ('GZIP, deflate', 'gzip'),
+    ('gzip;q=0', None),
+    ('gzip; q=0.0, identity', None),
+    ('deflate, identity', None),
+    ('', None),
+    ('*', SUPPORTED_ENCODINGS[0]),
+    ('*;q=0', None),
+    ('*, gzip;q=0', 'br' if 'br' in SUPPORTED_ENCODINGS else None),
+    ('gzip;q=0.5, br;q=0.2', 'gzip'),
+    ('gzip;q=abc', None),
+])
+def test_choose_encoding_honours_q_values_and_wildcard(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_choose_encoding_prefers_brotli_when_weighted_equally():
+    if 'br' not in SUPPORTED_ENCODINGS:
+        pytest.skip("brotli is not installed")
+    assert choose_encoding('gzip, br') == 'br'
+
+
+@pytest.fixture
+def backend():
+    backend = ChatBackend()
+    backend.settings.compression_enabled = True
+    backend.settings.compression_min_bytes = 1024
+    backend.settings.log_response_savings = False
+    return backend
+
+
+def chat_request(accept_encoding='gzip'):
+    return HttpRequest('POST', '/api/chat', {'accept-encoding': accept_encoding}, b'')
+
+
+def large_answer():
+    body = json.dumps({'message': "Open the VPN client and choose Reset. " * 100}).encode('utf-8')
+    return HttpResponse(200, body, headers={'X-Atos-Source': 'upstream'})
+
+
+def test_encode_response_compresses_and_sets_headers(backend):
+    response = large_answer()
+
+    encoded = backend._encode_response(chat_request('gzip'), response)
+
+    assert encoded.headers['Content-Encoding'] == 'gzip'
+    assert encoded.headers['Vary'] == 'Accept-Encoding'
+    assert encoded.headers['X-Atos-Source'] == 'upstream'
+    assert gzip.decompress(encoded.body) == response.body
+    assert backend.counters['compressed_responses'] == 1
+
+
+def test_encode_response_never_modifies_the_shared_response(backend):
+    # Coalesced followers receive the same response object as the leader
+    response = large_answer()
+    body, headers = response.body, dict(response.headers)
+
+    backend._encode_response(chat_request('gzip'), response)
+    identity = backend._encode_response(chat_request(''), response)
+
+    assert response.body is body
+    assert response.headers == headers
+    assert identity.body == body
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.headers['Vary'] == 'Accept-Encoding'
+
+
+def test_encode_response_leaves_small_bodies_alone(backend):
+    response = HttpResponse(200, b'{"message":"ok"}')
+
+    assert backend._encode_response(chat_request('gzip'), response) is response
+    assert 'Vary' not in response.headers
+
+
+def test_encode_response_skips_binary_content(backend):
+    response = HttpResponse(200, bytes(range(256)) * 8, content_type='image/png')
+
+    assert backend._encode_response(chat_request('gzip'), response) is response
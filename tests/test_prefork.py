@@ -0,0 +1,122 @@
+import asyncio
+import json
+import socket
+
+from backend.cache import NearDuplicateCache
+from backend.metrics import MetricsRegistry, merge_snapshots
+from backend.prefork import ClusterChannel, _encode, message_type, size_fields, sum_counters
+
+
+def worker_stats(requests, entries):
+    return {
+        'backend': {'requests': requests},
+        'answer_cache': {'enabled': True, 'near_hits': 1, 'entries': entries, 'threshold': 0.8},
+        'latency_seconds': {'samples': 10, 'p95': 0.4},
+        'typeahead_entries': entries,
+    }
+
+
+def test_sum_counters_leaves_out_replicated_sizes():
+    totals = sum_counters([worker_stats(3, 100), worker_stats(4, 101)])
+
+    assert totals == {
+        'backend': {'requests': 7},
+        'answer_cache': {'near_hits': 2},
+        'latency_seconds': {},
+    }
+
+
+def test_size_fields_flattens_one_worker():
+    assert size_fields(worker_stats(3, 100)) == {
+        'answer_cache.entries': 100,
+        'latency_seconds.samples': 10,
+        'typeahead_entries': 100,
+    }
+
+
+def test_merge_snapshots_takes_max_of_replicated_gauges():
+    snapshots = [
+        {'gauge': {'atos_cache_entries': {'': 100}, 'atos_inflight_requests': {'': 2}}},
+        {'gauge': {'atos_cache_entries': {'': 98}, 'atos_inflight_requests': {'': 3}}},
+    ]
+
+    gauges = merge_snapshots(snapshots)['gauge']
+
+    assert gauges['atos_cache_entries'] == {'': 100}
+    assert gauges['atos_inflight_requests'] == {'': 5}
+
+
+def test_sum_counters_takes_max_of_replicated_cache_events():
+    snapshots = [
+        {'answer_cache': {'inserts': 50, 'evictions': 5, 'expired': 2, 'misses': 10}},
+        {'answer_cache': {'inserts': 49, 'evictions': 5, 'expired': 3, 'misses': 7}},
+    ]
+
+    assert sum_counters(snapshots) == {
+        'answer_cache': {'inserts': 50, 'evictions': 5, 'expired': 3, 'misses': 17},
+    }
+
+
+def test_merge_snapshots_takes_max_of_cache_evictions():
+    snapshots = [
+        {'counter': {'atos_cache_evictions_total': {'': 7}, 'atos_requests_total': {'': 3}}},
+        {'counter': {'atos_cache_evictions_total': {'': 6}, 'atos_requests_total': {'': 4}}},
+    ]
+
+    counters = merge_snapshots(snapshots)['counter']
+
+    assert counters['atos_cache_evictions_total'] == {'': 7}
+    assert counters['atos_requests_total'] == {'': 7}
+
+
+def test_message_type_is_read_from_the_line_prefix():
+    line = _encode({'message': 'how do I reset my password', 'type': 'answer'}).rstrip(b'\n')
+
+    assert message_type(line) == 'answer'
+    assert json.loads(line)['message'] == 'how do I reset my password'
+    assert message_type(b'{"message":"x"}') is None
+    assert message_type(b'garbage') is None
+
+
+class RecordingBackend:
+    def __init__(self, cache):
+        self.cache = cache
+        self.answers = []
+
+    def remember_answer(self, message, body, fingerprint=None):
+        self.answers.append((message, body, fingerprint))
+        self.cache.add(message, body, fingerprint)
+
+
+def test_relayed_answer_reuses_the_senders_fingerprint():
+    sender = ClusterChannel(None, None)
+    asked = NearDuplicateCache()
+    fingerprint = asked.fingerprint("how do I reset my VPN password")
+    sender.publish_answer("how do I reset my VPN password", b'answer', fingerprint)
+    line = _encode(sender._outbox[0])
+
+    backend = RecordingBackend(NearDuplicateCache())
+    ClusterChannel(None, backend)._apply(json.loads(line))
+
+    assert backend.answers == [("how do I reset my VPN password", b'answer', fingerprint)]
+    assert backend.cache.lookup("reset vpn password how?")[0] == b'answer'
+
+
+class IdleBackend:
+    metrics = MetricsRegistry()
+
+    def local_stats(self):
+        return {}
+
+
+def test_worker_stops_when_the_master_goes_away():
+    async def scenario():
+        worker_sock, master_sock = socket.socketpair()
+        lost = asyncio.Event()
+        channel = ClusterChannel(worker_sock, IdleBackend(), on_lost=lost.set)
+        await channel.start()
+        master_sock.close()
+        await asyncio.wait_for(lost.wait(), timeout=2)
+        await channel.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from backend.resilience import CircuitBreaker, HedgedCaller, LatencyTracker
+
+
+def attempts(*behaviours):
+    """Factory whose n-th call sleeps, then returns or raises behaviours[n]"""
+    calls = []
+
+    def factory():
+        delay, outcome = behaviours[len(calls)]
+        calls.append(delay)
+
+        async def attempt():
+            await asyncio.sleep(delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return attempt()
+    factory.calls = calls
+    return factory
+
+
+def hedger(delay=0.05):
+    return HedgedCaller(LatencyTracker(), min_samples=100, default_delay=delay)
+
+
+def test_primary_wins_without_hedging():
+    caller = hedger()
+    factory = attempts((0.0, 'primary'))
+
+    assert asyncio.run(caller.call(factory)) == 'primary'
+    assert len(factory.calls) == 1
+    assert caller.counters['primary_wins'] == 1
+    assert caller.counters['hedges_sent'] == 0
+
+
+def test_hedge_wins_and_slow_primary_is_cancelled():
+    caller = hedger()
+    factory = attempts((1.0, 'primary'), (0.0, 'hedge'))
+
+    async def run():
+        result = await caller.call(factory)
+        await asyncio.sleep(0)  # let the cancelled primary record its latency
+        return result
+
+    assert asyncio.run(run()) == 'hedge'
+    assert caller.counters['hedges_sent'] == 1
+    assert caller.counters['hedge_wins'] == 1
+    assert caller.counters['losers_cancelled'] == 1
+    # The cancelled primary is recorded with the time it had been running,
+    # not the hedge's much shorter one
+    assert len(caller.tracker) == 1
+    assert caller.tracker.percentile(100) >= 0.05
+
+
+def test_primary_can_still_win_after_hedge_is_sent():
+    caller = hedger()
+    factory = attempts((0.08, 'primary'), (1.0, 'hedge'))
+
+    assert asyncio.run(caller.call(factory)) == 'primary'
+    assert caller.counters['primary_wins'] == 1
+    assert caller.counters['losers_cancelled'] == 1
+
+
+def test_both_attempts_failing_raises_the_last_error():
+    caller = hedger()
+    factory = attempts((0.1, ValueError('primary')), (0.0, ValueError('hedge')))
+
+    with pytest.raises(ValueError, match='primary'):
+        asyncio.run(caller.call(factory))
+    assert caller.counters['hedges_sent'] == 1
+    assert caller.counters['losers_cancelled'] == 0
+    assert caller.counters['primary_wins'] == caller.counters['hedge_wins'] == 0
+
+
+def test_hedge_delay_tracks_percentile_once_warmed_up():
+    tracker = LatencyTracker()
+    caller = HedgedCaller(tracker, percentile=90, min_samples=10, default_delay=2.0)
+    assert caller.hedge_delay() == 2.0
+
+    for i in range(1, 11):
+        tracker.record(i / 10)
+
+    assert caller.hedge_delay() == pytest.approx(0.9)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_then_half_opens_then_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    clock.now = 10.0
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+    assert breaker.counters['opened'] == 1
+    assert breaker.counters['half_open_probes'] == 1
+    assert breaker.counters['short_circuited'] == 2
+
+
+def test_failed_probe_reopens_the_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5.0, clock=clock)
+    breaker.record_failure()
+
+    clock.now = 5.0
+    assert breaker.allow_request()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.counters['opened'] == 2
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from setup_atos_chatbot import generate_service_worker
+
+
+@pytest.fixture
+def build(tmp_path):
+    build_dir = tmp_path / 'build'
+    (build_dir / 'static' / 'js').mkdir(parents=True)
+    (build_dir / 'index.html').write_text('<div id="root"></div>', encoding='utf-8')
+    manifest = {'files': {
+        'main.js': '/static/js/main.abc.js',
+        'main.js.map': '/static/js/main.abc.js.map',
+        'main.js.LICENSE.txt': '/static/js/main.abc.js.LICENSE.txt',
+        'chunk.js': '/static/js/1.def.chunk.js',
+    }}
+    (build_dir / 'asset-manifest.json').write_text(json.dumps(manifest), encoding='utf-8')
+    return build_dir
+
+
+def precache_paths(build_dir):
+    source = (build_dir / 'service-worker.js').read_text(encoding='utf-8')
+    start = source.index('const PRECACHE_PATHS = ') + len('const PRECACHE_PATHS = ')
+    return json.loads(source[start:source.index(';', start)])
+
+
+def version(build_dir):
+    source = (build_dir / 'service-worker.js').read_text(encoding='utf-8')
+    return source.split("const CACHE_NAME = CACHE_PREFIX + '", 1)[1].split("'", 1)[0]
+
+
+def test_precache_skips_source_maps_and_licenses(build):
+    assert generate_service_worker(str(build))
+    paths = precache_paths(build)
+    assert '/static/js/main.abc.js' in paths
+    assert '/static/js/1.def.chunk.js' in paths
+    assert not any(path.endswith(('.map', '.LICENSE.txt')) for path in paths)
+
+
+def test_index_html_is_added_when_missing_from_manifest(build):
+    assert generate_service_worker(str(build))
+    assert './index.html' in precache_paths(build)
+
+
+def test_index_html_from_manifest_is_not_duplicated(build):
+    manifest = json.loads((build / 'asset-manifest.json').read_text(encoding='utf-8'))
+    manifest['files']['index.html'] = '/index.html'
+    (build / 'asset-manifest.json').write_text(json.dumps(manifest), encoding='utf-8')
+
+    assert generate_service_worker(str(build))
+    paths = precache_paths(build)
+    assert '/index.html' in paths
+    assert './index.html' not in paths
+
+
+def test_version_changes_when_only_index_html_changes(build):
+    assert generate_service_worker(str(build))
+    first = version(build)
+    assert generate_service_worker(str(build))
+    assert version(build) == first
+
+    (build / 'index.html').write_text('<div id="root"></div><!-- v2 -->', encoding='utf-8')
+    assert generate_service_worker(str(build))
+    assert version(build) != first
+
+
+def test_missing_manifest_fails(tmp_path):
+    assert not generate_service_worker(str(tmp_path))
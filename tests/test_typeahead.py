@@ -0,0 +1,85 @@
+import json
+
+from backend.typeahead import SuggestionIndex
+
+
+def test_new_query_survives_pruning_of_a_full_index():
+    index = SuggestionIndex(max_entries=10, min_count=1)
+    for i in range(11):
+        index.add(f"old question {i}")
+
+    index.add("brand new question")
+
+    assert len(index) == 10
+    assert index.suggest("brand") == ["brand new question"]
+
+
+def test_frequent_queries_outrank_recent_ones_when_pruning():
+    index = SuggestionIndex(max_entries=2, min_count=1)
+    index.add("popular question", count=5)
+    for i in range(3):
+        index.add(f"one off {i}")
+
+    assert index.suggest("popular") == ["popular question"]
+
+
+def test_query_is_suggested_only_after_min_count_sightings():
+    index = SuggestionIndex(min_count=2)
+    index.add("private question about my payslip")
+    assert index.suggest("private") == []
+
+    index.add("private question about my payslip")
+    assert index.suggest("private") == ["private question about my payslip"]
+
+
+def test_suggestions_ranked_by_count():
+    index = SuggestionIndex(min_count=1)
+    index.add("vpn setup", count=2)
+    index.add("vpn reset password", count=5)
+    index.add("vpnclient download", count=9)
+
+    assert index.suggest("vpn ") == ["vpn reset password", "vpn setup"]
+    assert index.suggest("vpn") == ["vpnclient download", "vpn reset password", "vpn setup"]
+
+
+def test_load_jsonl_honours_count(tmp_path):
+    seed = tmp_path / 'seed.jsonl'
+    seed.write_text('\n'.join([
+        json.dumps({'message': "How do I reset my password", 'count': 3}),
+        json.dumps({'query': "how to book a meeting room"}),
+        'not json',
+    ]), encoding='utf-8')
+    index = SuggestionIndex(min_count=2)
+
+    assert index.load_jsonl(seed) == 2
+    assert index.suggest("how") == ["How do I reset my password"]
+
+
+def test_same_session_asking_again_does_not_make_a_query_eligible():
+    index = SuggestionIndex(min_count=2)
+    for _ in range(3):
+        # The same user asking again, or the client retrying the request
+        index.add("private question about my payslip", session='session-a')
+    assert index.suggest("private") == []
+
+    index.add("Private question about my payslip?", session='session-b')
+    assert index.suggest("private") == ["Private question about my payslip?"]
+
+
+def test_requests_without_a_session_count_as_one_asker():
+    index = SuggestionIndex(min_count=2)
+    index.add("private question about my payslip", session='')
+    index.add("private question about my payslip", session='')
+    assert index.suggest("private") == []
+
+    index.add("private question about my payslip", session='session-a')
+    assert index.suggest("private") == ["private question about my payslip"]
+
+
+def test_sessions_are_forgotten_once_a_query_is_eligible():
+    index = SuggestionIndex(min_count=2)
+    index.add("vpn reset password", session='session-a')
+    index.add("vpn reset password", session='session-b')
+    index.add("vpn setup", session='session-c')
+
+    assert set(index._askers) == {'vpn setup'}